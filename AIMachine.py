@@ -21,6 +21,11 @@ BOARD_DECISION = "board_decision"
 EXIT_CONDITION_REACHED = "exit_condition_reached"
 
 TRANSITIONS = [
+    {
+        "trigger": BOARD_DECISION,
+        "source": IDLE,
+        "dest": EVALUATING_POLICY
+    },
     {
         "trigger": VALUE_DETERMINED,
         "source": VALUATION,
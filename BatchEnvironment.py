@@ -0,0 +1,359 @@
+# BatchEnvironment.py
+"""Gym-style batch of boards for self-play and training: N copies of a level held as stacked
+NumPy arrays and stepped together, one action per board per step().
+The rules mirror Simulation.arrive (Game.evaluate_goal_arrival): scoring in an Endzone
+while carrying the ball, picking the ball up, bouncing it otherwise.
+
+Each step is one move (or a pass) by the side to move on every board, then that side's turn ends."""
+import time
+import logging
+
+import numpy as np
+
+import DistanceField
+from Grid import Space, NO_TERRAIN, EMPTY, TERRAIN_CODES
+from Simulation import PLAYER, CPU, PICKUP, BOUNCE, VICTORY, load_simulation
+
+# Team codes in the arrays, and the order pieces are numbered in
+TEAMS = [PLAYER, CPU]
+TEAM_CODES = {team: code for code, team in enumerate(TEAMS)}
+
+PASS = -1 # Action piece index for "move nothing this turn"
+ENDZONE = TERRAIN_CODES["Endzone"]
+
+# Observation channels, each [x, y], seen from the side to move
+CHANNELS = ["board", "endzone", "cost", "own", "opponent", "ball", "carrier"]
+
+# Board neighbors in Grid.DIRECTIONS order (north, south, west, east), for bounces
+NEIGHBOR_STEPS = np.array([(0, -1), (0, 1), (-1, 0), (1, 0)])
+
+class BatchEnvironment:
+    """count boards of one level. State arrays, board first:
+        terrain [n, x, y] terrain codes (NO_TERRAIN off the board)
+        occupancy [n, x, y] team code of the piece on each space, EMPTY when free
+        pieces [n, x, y] piece index on each space, EMPTY when free
+        ball [n, x, y] True on the ball's space (the carrier's space while carried)
+        carrier [n] piece index holding the ball, EMPTY while it is loose
+        positions [n, piece, 2] piece spaces
+    Pieces are numbered player first, then cpu; piece_team, can_carry and movement_range are per piece.
+    Actions are [n, 3] (piece, x, y): move that piece of the side to move to (x, y), or piece PASS.
+    Invalid actions are taken as passes and flagged in info["invalid"]"""
+    def __init__(self, count: int, level_id: int = 1, seed: int = None, max_turns: int = 200,
+            win_reward: float = 1.0, pickup_reward: float = 0.0):
+        self.count = count
+        self.level_id = level_id
+        self.max_turns = max_turns
+        self.win_reward = win_reward
+        self.pickup_reward = pickup_reward
+        self.random = np.random.default_rng(seed)
+
+        # The level once, as a Simulation, then copied into every board on reset
+        simulation = load_simulation(level_id)
+        grid = simulation.grid
+        self.width, self.height = grid.width, grid.height
+        self.board_terrain = grid.terrain.copy()
+        self.board_costs = grid.costs.copy()
+
+        actors = [actor for team in TEAMS for actor in simulation.pieces(team) if not actor.is_ball]
+        balls = [actor for actor in simulation.teams if actor.is_ball]
+        if len(balls) != 1:
+            raise ValueError(f"Level {level_id} needs exactly one ball, found {len(balls)}")
+        self.piece_names = [actor.name for actor in actors]
+        self.piece_team = np.array([TEAM_CODES[simulation.teams[actor]] for actor in actors], dtype=np.int8)
+        self.can_carry = np.array([actor.can_carry for actor in actors], dtype=bool)
+        self.movement_range = np.array([actor.movement_range for actor in actors], dtype=np.int32)
+        self.start_positions = np.array([simulation.positions[actor] for actor in actors], dtype=np.int32)
+        self.start_ball = tuple(simulation.positions[balls[0]])
+
+        n, w, h = count, self.width, self.height
+        self.terrain = np.broadcast_to(self.board_terrain, (n, w, h)).copy()
+        self.costs = np.broadcast_to(self.board_costs, (n, w, h)).copy()
+        self.occupancy = np.full((n, w, h), EMPTY, dtype=np.int8)
+        self.pieces = np.full((n, w, h), EMPTY, dtype=np.int8)
+        self.ball = np.zeros((n, w, h), dtype=bool)
+        self.carrier = np.full(n, EMPTY, dtype=np.int32)
+        self.positions = np.zeros((n, len(actors), 2), dtype=np.int32)
+        self.turn = np.zeros(n, dtype=np.int8) # Team code to move
+        self.turn_number = np.ones(n, dtype=np.int32)
+        self.winner = np.full(n, EMPTY, dtype=np.int8)
+        self.reset()
+
+    @property
+    def piece_count(self) -> int:
+        return len(self.piece_team)
+
+    def reset(self, boards: np.ndarray = None) -> np.ndarray:
+        """Put boards (an index array or bool mask, default all) back to the level start.
+        Returns the observation of every board"""
+        if boards is None:
+            boards = np.arange(self.count)
+        boards = np.asarray(boards)
+        if boards.dtype == bool:
+            boards = np.flatnonzero(boards)
+
+        self.occupancy[boards] = EMPTY
+        self.pieces[boards] = EMPTY
+        self.ball[boards] = False
+        piece_indices = np.arange(self.piece_count)
+        xs, ys = self.start_positions[:, 0], self.start_positions[:, 1]
+        self.occupancy[boards[:, None], xs, ys] = self.piece_team
+        self.pieces[boards[:, None], xs, ys] = piece_indices
+        self.ball[(boards, *self.start_ball)] = True
+        self.positions[boards] = self.start_positions
+
+        self.carrier[boards] = EMPTY
+        self.turn[boards] = TEAM_CODES[PLAYER]
+        self.turn_number[boards] = 1
+        self.winner[boards] = EMPTY
+        return self.observe()
+
+    def observe(self) -> np.ndarray:
+        """[n, channel, x, y] float32 planes (see CHANNELS) from each board's side to move"""
+        on_board = self.terrain != NO_TERRAIN
+        turn = self.turn[:, None, None]
+        carrier_plane = np.zeros_like(self.ball)
+        holding = np.flatnonzero(self.carrier != EMPTY)
+        spaces = self.positions[holding, self.carrier[holding]]
+        carrier_plane[holding, spaces[:, 0], spaces[:, 1]] = True
+
+        return np.stack([
+            on_board,
+            self.terrain == ENDZONE,
+            self.costs,
+            self.occupancy == turn,
+            (self.occupancy != EMPTY) & (self.occupancy != turn),
+            self.ball,
+            carrier_plane
+        ], axis=1).astype(np.float32)
+
+    # Move validation
+    def goal_masks(self, piece: np.ndarray) -> np.ndarray:
+        """[n, x, y] spaces each board's piece may move to: within its movement range over
+        free board spaces (Simulation.legal_goals), for all boards at once. PASS rows are all False"""
+        boards = np.arange(self.count)
+        moving = piece != PASS
+        piece = np.where(moving, piece, 0)
+        start = self.positions[boards, piece]
+
+        walkable = (self.terrain != NO_TERRAIN) & (self.pieces == EMPTY)
+        sources = np.zeros_like(walkable)
+        sources[boards[moving], start[moving, 0], start[moving, 1]] = True
+        limits = np.where(moving, self.movement_range[piece], 0)
+        distance = DistanceField.batch_distance_field(walkable, self.costs, sources, limits)
+        # Reached and free: drops the piece's own (solid) space
+        return (distance < np.inf) & walkable
+
+    def action_masks(self) -> np.ndarray:
+        """[n, piece, x, y] legal goals of every piece, False for pieces not on the side to move.
+        All pieces of all boards relax together as one n * piece stack"""
+        n, pieces = self.count, self.piece_count
+        walkable = (self.terrain != NO_TERRAIN) & (self.pieces == EMPTY)
+        stacked = np.repeat(walkable, pieces, axis=0)
+        sources = np.zeros_like(stacked)
+        flat = np.arange(n * pieces)
+        positions = self.positions.reshape(-1, 2)
+        sources[flat, positions[:, 0], positions[:, 1]] = True
+        movable = self.piece_team[None, :] == self.turn[:, None]
+        limits = np.where(movable, self.movement_range[None, :], 0).ravel()
+
+        distance = DistanceField.batch_distance_field(stacked, np.repeat(self.costs, pieces, axis=0), sources, limits)
+        return ((distance < np.inf) & stacked).reshape(n, pieces, self.width, self.height)
+
+    def valid_actions(self, actions: np.ndarray) -> np.ndarray:
+        """[n] True where the action is a legal move for the side to move"""
+        piece, x, y = actions[:, 0], actions[:, 1], actions[:, 2]
+        moving = (piece >= 0) & (piece < self.piece_count)
+        piece = np.where(moving, piece, PASS)
+        moving &= self.piece_team[np.where(moving, piece, 0)] == self.turn
+        moving &= (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        if not moving.any():
+            return moving
+        masks = self.goal_masks(np.where(moving, piece, PASS))
+        boards = np.arange(self.count)
+        return moving & masks[boards, np.clip(x, 0, self.width - 1), np.clip(y, 0, self.height - 1)]
+
+    def sample_actions(self) -> np.ndarray:
+        """Random legal action per board: a random piece of the side to move with a goal,
+        then a random goal for it (PASS where nothing can move)"""
+        masks = self.action_masks()
+        flat = masks.reshape(self.count, -1)
+        keys = np.where(flat, self.random.random(flat.shape), -1.0)
+        choice = keys.argmax(axis=1)
+        piece, space = np.divmod(choice, self.width * self.height)
+        x, y = np.divmod(space, self.height)
+        piece = np.where(flat.any(axis=1), piece, PASS)
+        return np.stack([piece, x, y], axis=1)
+
+    # Stepping
+    def step(self, actions) -> tuple:
+        """Apply one action per board. Returns (observations, rewards, dones, info):
+        rewards are for the side that moved, finished boards are reset (their last
+        observation is info["final_observation"])"""
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.count, 3)
+        valid = self.valid_actions(actions)
+        rewards = np.zeros(self.count, dtype=np.float32)
+
+        rows = np.flatnonzero(valid)
+        piece = actions[rows, 0]
+        goal_x, goal_y = actions[rows, 1], actions[rows, 2]
+        start_x, start_y = self.positions[rows, piece, 0], self.positions[rows, piece, 1]
+        team = self.piece_team[piece]
+
+        # Priority 1: Game Enders, then Priority 2: Ball events (as in Simulation.arrive)
+        carrying = self.carrier[rows] == piece
+        scored = carrying & (self.terrain[rows, goal_x, goal_y] == ENDZONE)
+        ball_here = self.ball[rows, goal_x, goal_y] & ~scored
+        pickup = ball_here & self.can_carry[piece] & (self.carrier[rows] == EMPTY)
+        bounce = ball_here & ~pickup
+
+        # Leave
+        self.pieces[rows, start_x, start_y] = EMPTY
+        self.occupancy[rows, start_x, start_y] = EMPTY
+
+        if bounce.any():
+            self.bounce_balls(rows[bounce], goal_x[bounce], goal_y[bounce])
+
+        # Arrive, carried balls riding along
+        self.pieces[rows, goal_x, goal_y] = piece
+        self.occupancy[rows, goal_x, goal_y] = team
+        self.positions[rows, piece, 0] = goal_x
+        self.positions[rows, piece, 1] = goal_y
+        carried = rows[carrying]
+        self.ball[carried, start_x[carrying], start_y[carrying]] = False
+        self.ball[carried, goal_x[carrying], goal_y[carrying]] = True
+
+        self.carrier[rows[pickup]] = piece[pickup]
+        rewards[rows[pickup]] += self.pickup_reward
+        self.winner[rows[scored]] = team[scored]
+        rewards[rows[scored]] += self.win_reward
+
+        # End turn on every board, moved or not
+        self.turn = 1 - self.turn
+        self.turn_number += 1
+
+        won = self.winner != EMPTY
+        truncated = ~won & (self.turn_number > self.max_turns)
+        dones = won | truncated
+        info = {
+            "invalid": ~valid & (actions[:, 0] != PASS),
+            "winner": self.winner.copy(),
+            "truncated": truncated
+        }
+        if dones.any():
+            info["final_observation"] = self.observe()
+            self.reset(dones)
+        return self.observe(), rewards, dones, info
+
+    def bounce_balls(self, boards: np.ndarray, x: np.ndarray, y: np.ndarray):
+        """Move each board's ball from (x, y) to a random free neighbor (Grid.random_neighbor).
+        With no free neighbor the ball stays put"""
+        neighbors = np.stack([x, y], axis=1)[:, None, :] + NEIGHBOR_STEPS # [boards, direction, 2]
+        nx, ny = neighbors[..., 0], neighbors[..., 1]
+        in_bounds = (nx >= 0) & (nx < self.width) & (ny >= 0) & (ny < self.height)
+        cx, cy = np.clip(nx, 0, self.width - 1), np.clip(ny, 0, self.height - 1)
+        rows = boards[:, None]
+        free = in_bounds & (self.terrain[rows, cx, cy] != NO_TERRAIN) & (self.pieces[rows, cx, cy] == EMPTY)
+
+        keys = np.where(free, self.random.random(free.shape), -1.0)
+        direction = keys.argmax(axis=1)
+        moves = free.any(axis=1)
+        if not moves.all():
+            logging.info(f"No space to bounce the ball on {np.count_nonzero(~moves)} boards")
+        boards, direction = boards[moves], direction[moves]
+        to_x, to_y = nx[moves, direction], ny[moves, direction]
+        self.ball[boards, x[moves], y[moves]] = False
+        self.ball[boards, to_x, to_y] = True
+
+def check_against_simulation(level_id: int = 1, seed: int = 413):
+    """Play one scripted game on a single board and on a Simulation of the same level,
+    asserting identical positions, carrier, ball, side to move and winner after every step.
+    The script bounces the ball with a blocker, tries an invalid move (a player piece on the
+    CPU's turn, flagged in info["invalid"]), picks the ball up and scores with the carrier.
+    Bounces are random on both sides, so the Simulation's ball follows the board's bounce"""
+    environment = BatchEnvironment(1, level_id=level_id, seed=seed, max_turns=1000)
+    simulation = load_simulation(level_id, seed=seed)
+    grid = simulation.grid
+    actors = [actor for team in TEAMS for actor in simulation.pieces(team) if not actor.is_ball]
+    ball = next(actor for actor in simulation.teams if actor.is_ball)
+    player = [index for index, actor in enumerate(actors) if simulation.teams[actor] == PLAYER]
+    carrier = next(index for index in player if actors[index].can_carry)
+    blocker = next(index for index in player if not actors[index].can_carry)
+    endzone = [tuple(space) for space in np.argwhere(grid.terrain == ENDZONE).tolist()]
+
+    def toward(index: int, target: tuple) -> tuple:
+        goals = simulation.legal_goals(actors[index])
+        return min(goals, key=lambda space: (abs(space[0] - target[0]) + abs(space[1] - target[1]), space))
+
+    seen = set()
+    while not simulation.game_over:
+        assert simulation.turn_number < environment.max_turns, "scripted game never finished"
+        if simulation.team_to_move == CPU:
+            invalid = "invalid" not in seen
+            action = (carrier, *simulation.positions[ball]) if invalid else (PASS, 0, 0)
+        elif "bounce" not in seen:
+            invalid = False
+            action = (blocker, *toward(blocker, simulation.positions[ball]))
+        elif actors[carrier].carrying is None:
+            invalid = False
+            action = (carrier, *toward(carrier, simulation.positions[ball]))
+        else:
+            invalid = False
+            space = simulation.positions[actors[carrier]]
+            action = (carrier, *toward(carrier, min(endzone,
+                key=lambda goal: abs(goal[0] - space[0]) + abs(goal[1] - space[1]))))
+
+        outcomes = list()
+        if action[0] != PASS and not invalid:
+            outcomes = simulation.move(actors[action[0]], action[1:])
+        _, _, dones, info = environment.step(np.array([action]))
+        assert info["invalid"][0] == invalid, (action, info["invalid"])
+        if invalid:
+            seen.add("invalid")
+
+        for outcome in outcomes:
+            if outcome[0] == BOUNCE:
+                seen.add("bounce")
+                bounced = Space(*np.argwhere(environment.ball[0])[0].tolist())
+                goal = Space(*action[1:])
+                assert bounced in list(grid.neighbors(goal)), (bounced, goal)
+                landed = simulation.positions[ball]
+                grid[landed] = None, grid[landed].terrain
+                grid[bounced] = ball, grid[bounced].terrain
+                simulation.positions[ball] = bounced
+            elif outcome[0] == PICKUP:
+                seen.add("pickup")
+            elif outcome[0] == VICTORY:
+                seen.add("score")
+        if simulation.game_over:
+            assert dones[0] and info["winner"][0] == TEAM_CODES[simulation.winner], info
+            break
+        simulation.end_turn()
+
+        assert not dones[0] and environment.winner[0] == EMPTY
+        assert TEAMS[environment.turn[0]] == simulation.team_to_move
+        for index, actor in enumerate(actors):
+            assert tuple(environment.positions[0, index]) == simulation.positions[actor], actor
+        holder = next((index for index, actor in enumerate(actors) if actor.carrying is ball), EMPTY)
+        assert environment.carrier[0] == holder, (environment.carrier[0], holder)
+        assert tuple(np.argwhere(environment.ball[0])[0]) == simulation.positions[ball]
+
+    assert seen == {"bounce", "invalid", "pickup", "score"}, seen
+    print(f"Board rules match Simulation over {simulation.turn_number} turns: bounce, invalid move, pickup, score")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    check_against_simulation()
+
+    # Throughput check: random legal moves on 256 boards of level 1
+    environment = BatchEnvironment(256, level_id=1, seed=413)
+    environment.reset()
+    steps = 0
+    games = 0
+    begin = time.perf_counter()
+    while time.perf_counter() - begin < 2.0:
+        _, _, dones, _ = environment.step(environment.sample_actions())
+        steps += 1
+        games += int(dones.sum())
+    elapsed = time.perf_counter() - begin
+    board_steps = steps * environment.count
+    print(f"{board_steps} board steps ({games} games) in {elapsed:.2f} s, {board_steps / elapsed:.0f} board steps/sec")
@@ -0,0 +1,168 @@
+# Benchmark.py
+"""Pathfinding benchmarks over generated boards (fixed seeds).
+
+    python Benchmark.py                       # run and compare against the stored baseline
+    python Benchmark.py --save-baseline       # run and store the results as the new baseline
+    python Benchmark.py --sizes 15 200 --density 0.3 --queries 50
+
+Reports ops/sec, node expansions per query and peak traced memory for
+path_find (Jump Point Search on these uniform-cost boards), path_find_astar
+(the same queries forced onto heap A*), range_find and path_reconstruct, and exits non-zero when the
+baseline is missing or not comparable, or when expansions or peak memory
+regress past it by more than --tolerance. Wall time is too noisy to gate
+on by default: slower ops/sec are only reported, unless --time-tolerance
+is given."""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from Grid import Grid, NO_TERRAIN, terrain_code, path_find, range_find, path_reconstruct, warm_jump_points
+from constants import ROOT_PATH
+
+DEFAULT_SIZES = [15, 50, 100, 200, 500, 1000]
+BASELINE_FILE = os.path.join(ROOT_PATH, "benchmark_baseline.json")
+MEMORY_SAMPLES = 3 # Queries re-run under tracemalloc per case (it slows everything down)
+
+def generate_board(size: int, density: float, seed: int) -> Grid:
+    """size x size field with a density fraction of holes (unwalkable, like skipped map tiles)"""
+    rng = np.random.default_rng(seed)
+    codes = np.full((size, size), terrain_code("Blank"), dtype=np.int8)
+    codes[rng.random((size, size)) < density] = NO_TERRAIN
+
+    grid = Grid()
+    grid.load_terrain(codes)
+    return grid
+
+def generate_queries(grid: Grid, count: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    open_spaces = np.argwhere(grid.walkable_mask())
+    picks = rng.integers(0, len(open_spaces), size=(count, 2))
+    return [(tuple(open_spaces[a].tolist()), tuple(open_spaces[b].tolist())) for a, b in picks]
+
+def measure(operation, queries: list) -> dict:
+    stats = dict()
+    begin = time.perf_counter()
+    for query in queries:
+        operation(query, stats)
+    elapsed = time.perf_counter() - begin
+
+    peak = 0
+    tracemalloc.start()
+    for query in queries[:MEMORY_SAMPLES]:
+        tracemalloc.reset_peak()
+        operation(query, dict())
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": len(queries) / elapsed if elapsed else float("inf"),
+        "expansions": stats.get("expanded", 0) / len(queries),
+        "peak_kib": peak / 1024
+    }
+
+def run_size(size: int, args) -> dict:
+    grid = generate_board(size, args.density, args.seed)
+    queries = generate_queries(grid, args.queries, args.seed + size)
+    # Warm the flat search caches so the first query isn't charged for building them
+    grid.walkable_flat()
+    grid.walkable_padded()
+    grid.cost_flat()
+    warm_jump_points(grid)
+
+    searches = dict()
+    def run_path_find(query, stats):
+        start, goal = query
+        searches[query] = path_find(start, goal, grid, stats=stats)[0]
+
+    def run_path_find_astar(query, stats):
+        start, goal = query
+        path_find(start, goal, grid, stats=stats, jump_points=False)
+
+    def run_range_find(query, stats):
+        range_find(query[0], args.range, grid, stats=stats)
+
+    def run_path_reconstruct(query, stats):
+        start, goal = query
+        if goal in searches[query]: # Skip unreachable goals
+            path_reconstruct(start, goal, searches[query])
+
+    return {
+        "path_find": measure(run_path_find, queries),
+        "path_find_astar": measure(run_path_find_astar, queries),
+        "range_find": measure(run_range_find, queries),
+        "path_reconstruct": measure(run_path_reconstruct, queries)
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float, time_tolerance: float = None) -> tuple:
+    """Human-readable (regressions, advisories) past the tolerances (empty when all good).
+    Expansions and peak memory are deterministic for a seed and gate; ops/sec only gates
+    with a time_tolerance, otherwise drops past tolerance are advisories"""
+    regressions = list()
+    advisories = list()
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        slowdown = time_tolerance if time_tolerance is not None else tolerance
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - slowdown):
+            message = f"{key}: {result['ops_per_sec']:.1f} ops/sec vs baseline {base['ops_per_sec']:.1f}"
+            (regressions if time_tolerance is not None else advisories).append(message)
+        if result["expansions"] > base["expansions"] * (1 + tolerance):
+            regressions.append(f"{key}: {result['expansions']:.1f} expansions vs baseline {base['expansions']:.1f}")
+        if result["peak_kib"] > base["peak_kib"] * (1 + tolerance):
+            regressions.append(f"{key}: {result['peak_kib']:.1f} KiB peak vs baseline {base['peak_kib']:.1f}")
+    return regressions, advisories
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pathfinding and range-finding benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="board edge lengths")
+    parser.add_argument("--density", type=float, default=0.2, help="fraction of blocked cells")
+    parser.add_argument("--queries", type=int, default=20, help="queries per board")
+    parser.add_argument("--range", type=int, default=10, help="range_find movement range")
+    parser.add_argument("--seed", type=int, default=413)
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed expansions/memory regression fraction")
+    parser.add_argument("--time-tolerance", type=float, default=None,
+        help="allowed ops/sec drop fraction (default: ops/sec is advisory only)")
+    args = parser.parse_args(argv)
+
+    parameters = {"density": args.density, "queries": args.queries, "range": args.range, "seed": args.seed}
+    results = dict()
+    print(f"{'benchmark':<24}{'ops/sec':>12}{'expansions':>14}{'peak KiB':>12}")
+    for size in args.sizes:
+        for case, result in run_size(size, args).items():
+            key = f"{size}x{size}/{case}"
+            results[key] = result
+            print(f"{key:<24}{result['ops_per_sec']:>12.1f}{result['expansions']:>14.1f}{result['peak_kib']:>12.1f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"parameters": parameters, "results": results}, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return 1
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["parameters"] != parameters:
+        print(f"Baseline was recorded with {baseline['parameters']}, not comparable")
+        return 1
+
+    regressions, advisories = compare(results, baseline["results"], args.tolerance, args.time_tolerance)
+    for advisory in advisories:
+        print("SLOWER (advisory) " + advisory)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+from pygame import Rect
+
+from Grid import Grid
+
+MIN_ZOOM = 0.25
+MAX_ZOOM = 4.0
+MIN_CELL_SIZE = 4 # px on screen, whatever the zoom
+
+class Camera:
+    """Viewport onto the board. Game state stays in world pixels (cell_size per space);
+    the camera maps them to view pixels (view_cell_size per space, scrolled by offset)
+    for drawing, and view pixels (mouse) back to world pixels"""
+    def __init__(self, grid: Grid, cell_size: int, view_size: tuple, zoom: float = 1.0):
+        self.grid = grid
+        self.cell_size = cell_size
+        self.view_width, self.view_height = view_size
+
+        self.zoom = zoom
+        self.offset_x = 0 # View pixels scrolled past the board's top left
+        self.offset_y = 0
+
+    @property
+    def view_cell_size(self) -> int:
+        return max(MIN_CELL_SIZE, round(self.cell_size * self.zoom))
+
+    @property
+    def view_rect(self) -> Rect:
+        """The viewport, in view pixels"""
+        return Rect(0, 0, self.view_width, self.view_height)
+
+    def board_size(self) -> tuple:
+        """Whole board in view pixels, plus one for the grid line hangover"""
+        return (self.grid.width * self.view_cell_size + 1, self.grid.height * self.view_cell_size + 1)
+
+    # Movement
+    def scroll(self, dx: int, dy: int):
+        """Scroll by view pixels, clamped so the board never leaves the viewport"""
+        self.move_to(self.offset_x + dx, self.offset_y + dy)
+
+    def move_to(self, x: int, y: int):
+        board_width, board_height = self.board_size()
+        x = max(0, min(x, board_width - self.view_width))
+        y = max(0, min(y, board_height - self.view_height))
+        self.offset_x, self.offset_y = x, y
+
+    def zoom_to(self, zoom: float, anchor: tuple = None):
+        """Zoom keeping the view point anchor (default the view center) over the same board spot"""
+        zoom = max(MIN_ZOOM, min(zoom, MAX_ZOOM))
+        if anchor is None:
+            anchor = (self.view_width // 2, self.view_height // 2)
+        world = self.view_to_world(*anchor)
+
+        self.zoom = zoom
+        x, y = self.world_to_view(*world)
+        self.scroll(x - anchor[0], y - anchor[1])
+
+    def center_on(self, column: int, row: int):
+        x, y = self.space_to_view(column, row)
+        self.scroll(x + self.view_cell_size // 2 - self.view_width // 2,
+            y + self.view_cell_size // 2 - self.view_height // 2)
+
+    # Conversions
+    def world_to_view(self, x: int, y: int) -> tuple:
+        return (x * self.view_cell_size // self.cell_size - self.offset_x,
+            y * self.view_cell_size // self.cell_size - self.offset_y)
+
+    def view_to_world(self, x: int, y: int) -> tuple:
+        return ((x + self.offset_x) * self.cell_size // self.view_cell_size,
+            (y + self.offset_y) * self.cell_size // self.view_cell_size)
+
+    def space_to_view(self, column: int, row: int) -> tuple:
+        return (column * self.view_cell_size - self.offset_x, row * self.view_cell_size - self.offset_y)
+
+    def world_rect_to_view(self, rect: Rect) -> Rect:
+        x, y = self.world_to_view(rect.x, rect.y)
+        right, bottom = self.world_to_view(rect.right, rect.bottom)
+        return Rect(x, y, right - x, bottom - y)
+
+    def visible_spaces(self) -> tuple:
+        """(first column, first row, last column + 1, last row + 1) of the spaces in view"""
+        size = self.view_cell_size
+        return (max(0, self.offset_x // size),
+            max(0, self.offset_y // size),
+            min(self.grid.width, (self.offset_x + self.view_width) // size + 1),
+            min(self.grid.height, (self.offset_y + self.view_height) // size + 1))
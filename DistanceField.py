@@ -0,0 +1,111 @@
+import numpy as np
+
+from constants import NORTH, SOUTH, WEST, EAST
+
+# Flow field values: a direction constant, or NO_DIRECTION at sources and unreachable cells
+NO_DIRECTION = -1
+FLOW_DIRECTIONS = np.array([NORTH, SOUTH, WEST, EAST], dtype=np.int8) # DIRECTIONS order
+FLOW_STEPS = {NORTH: (0, -1), SOUTH: (0, 1), WEST: (-1, 0), EAST: (1, 0)}
+
+def distance_field(walkable: np.ndarray, sources: np.ndarray, max_distance: int = None) -> np.ndarray:
+    """Multi-source wavefront over a [x, y] board: steps from every cell to its nearest source.
+    Each pass grows the whole frontier by one step with array shifts.
+    Sources are seeded even when not walkable themselves (e.g. a solid actor).
+    Like Grid.range_find, only distances below max_distance are kept.
+    Unreached cells (and cells at max_distance or beyond) are np.inf"""
+    distance = np.full(walkable.shape, np.inf)
+    frontier = sources.copy()
+    reached = sources.copy()
+    distance[frontier] = 0
+
+    step = 0
+    while frontier.any():
+        step += 1
+        if max_distance is not None and step >= max_distance:
+            break
+
+        grown = np.zeros_like(frontier)
+        grown[:, 1:] |= frontier[:, :-1] # Reaching south
+        grown[:, :-1] |= frontier[:, 1:] # Reaching north
+        grown[1:, :] |= frontier[:-1, :] # Reaching east
+        grown[:-1, :] |= frontier[1:, :] # Reaching west
+
+        frontier = grown & walkable & ~reached
+        distance[frontier] = step
+        reached |= frontier
+
+    return distance
+
+def weighted_distance_field(walkable: np.ndarray, costs: np.ndarray, sources: np.ndarray, max_distance: int = None) -> np.ndarray:
+    """Multi-source movement cost where entering a cell costs costs[x, y], accumulated outward
+    from the sources: a cell's value is the cost of moving from its nearest source to it
+    (the cell's own cost counted, the source's not), as range_find measures from its start.
+    Moving the other way, cell to source, pays the source's cost instead of the cell's.
+    Every pass relaxes all cells from their four neighbors at once, until nothing improves.
+    Like Grid.range_find, only costs below max_distance are kept.
+    Unreached cells (and cells costing max_distance or more) are np.inf"""
+    entry_cost = np.where(walkable, costs, np.inf)
+    distance = np.full(walkable.shape, np.inf)
+    distance[sources] = 0
+
+    while True:
+        padded = np.pad(distance, 1, constant_values=np.inf)
+        nearest_neighbor = np.minimum.reduce([
+            padded[1:-1, :-2], # North
+            padded[1:-1, 2:], # South
+            padded[:-2, 1:-1], # West
+            padded[2:, 1:-1] # East
+        ])
+        relaxed = np.minimum(distance, nearest_neighbor + entry_cost)
+        if max_distance is not None:
+            relaxed[relaxed >= max_distance] = np.inf
+        if np.array_equal(relaxed, distance):
+            return distance
+        distance = relaxed
+
+def batch_distance_field(walkable: np.ndarray, costs: np.ndarray, sources: np.ndarray, limits: np.ndarray) -> np.ndarray:
+    """weighted_distance_field over a stack of [n, x, y] boards at once, each with its own limit.
+    Like Grid.range_find, only costs below a board's limit are kept; the rest are np.inf.
+    Relaxes in place inside one padded buffer, there are many boards to a pass"""
+    entry_cost = np.where(walkable, costs, np.inf)
+    padded = np.full((walkable.shape[0], walkable.shape[1] + 2, walkable.shape[2] + 2), np.inf)
+    distance = padded[:, 1:-1, 1:-1]
+    distance[sources] = 0
+    limits = np.asarray(limits).reshape(-1, 1, 1)
+
+    while True:
+        relaxed = np.minimum(padded[:, 1:-1, :-2], padded[:, 1:-1, 2:]) # North, south
+        np.minimum(relaxed, padded[:, :-2, 1:-1], out=relaxed) # West
+        np.minimum(relaxed, padded[:, 2:, 1:-1], out=relaxed) # East
+        relaxed += entry_cost
+        np.minimum(relaxed, distance, out=relaxed)
+        relaxed[relaxed >= limits] = np.inf
+        if np.array_equal(relaxed, distance):
+            return relaxed
+        distance[...] = relaxed
+
+def flow_field(distance: np.ndarray) -> np.ndarray:
+    """Next-step direction per cell: toward the neighbor closest to a source"""
+    padded = np.pad(distance, 1, constant_values=np.inf)
+    neighbor_distance = np.stack([
+        padded[1:-1, :-2], # North
+        padded[1:-1, 2:], # South
+        padded[:-2, 1:-1], # West
+        padded[2:, 1:-1] # East
+    ])
+
+    best = neighbor_distance.argmin(axis=0)
+    downhill = neighbor_distance.min(axis=0) < distance
+    return np.where(downhill, FLOW_DIRECTIONS[best], NO_DIRECTION).astype(np.int8)
+
+def flow_path(flow: np.ndarray, start: tuple) -> list:
+    """Cells visited following a flow field from start until it runs out (at a source)"""
+    x, y = start
+    path = [(x, y)]
+    direction = flow[x, y]
+    while direction != NO_DIRECTION:
+        dx, dy = FLOW_STEPS[direction]
+        x, y = x + dx, y + dy
+        path.append((x, y))
+        direction = flow[x, y]
+    return path
@@ -1,17 +1,25 @@
 # Driver.py
+import os
 import logging
-import ctypes
 
 import pygame
 import pygame.time
+import pygame.event
+import pygame.image
 import pygame.display
 
 from Game import Game
+from Grid import range_find
+from Simulation import PLAYER
 import Renderer
 import LevelLoader
+from dialogs import message_box
+from FrameProfiler import FrameProfiler
+from constants import BUTTON_LEFT_CLICK, BUTTON_RIGHT_CLICK, SIMULATION_HZ
 
-TARGET_FPS = 30
-LOOP_MS_PF = (1 / TARGET_FPS) * 1000
+TARGET_FPS = 60 # Render rate cap
+LOOP_MS_PF = (1 / SIMULATION_HZ) * 1000
+MAX_CATCH_UP_STEPS = 5 # Updates per frame at most; further backlog is dropped
 FPS_CLOCK = pygame.time.Clock() # TODO: Could DI this?
 
 RENDER_SURFACES = dict()
@@ -20,35 +28,46 @@ def register_surfaces(**surfaces: pygame.Surface):
     global RENDER_SURFACES
     RENDER_SURFACES = surfaces
 
-def game_loop(game: Game, debug: bool):
+def game_loop(game: Game, debug: bool, dirty_rects: bool = False, profile_path: str = None):
+    """Run the game until it's over.
+    The game updates at a fixed SIMULATION_HZ and renders once per loop, drawing
+    objects interpolated between their previous and current update positions.
+    With dirty_rects, frames after the first only redraw and push to the screen
+    the board regions the Game reported as damaged, plus HUD/menu when they change.
+    In debug mode, or when profile_path is given, every frame phase is timed: debug
+    shows a frame time graph, and on exit the percentiles are logged and, with
+    profile_path, written as a Chrome trace"""
     Renderer.register_display_surface(RENDER_SURFACES['display'])
-    Renderer.setup_background_board(RENDER_SURFACES['board'].copy(), game)
+    Renderer.setup_background_board(game)
+
+    profiler = None
+    if debug or profile_path is not None:
+        profiler = FrameProfiler(budget_ms=1000 / TARGET_FPS)
 
     loop_time_elapsed = 0
 
     # check Game Over from game/state
     while not game.game_over:
+        if profiler is not None:
+            profiler.begin_frame()
         loop_time_elapsed += FPS_CLOCK.get_time()
+        timed(profiler, "events", game.handle_events)
 
         # while Enough time has passed to tick one frame
-        while loop_time_elapsed >= LOOP_MS_PF:
+        steps = 0
+        while loop_time_elapsed >= LOOP_MS_PF and steps < MAX_CATCH_UP_STEPS:
             # TODO: Insert Collision Handler logic here?
-            game.handle_events()
-            game.update() # TODO: passing in partial MS deltas
+            timed(profiler, "update", game.update)
             loop_time_elapsed -= LOOP_MS_PF
+            steps += 1
+        if steps == MAX_CATCH_UP_STEPS:
+            # Too far behind (slow frame, debugger, window drag): drop the backlog
+            # rather than spend ever longer catching up
+            loop_time_elapsed = min(loop_time_elapsed, LOOP_MS_PF)
 
-        # Game is caught up, render current game state
-        Renderer.draw_game(RENDER_SURFACES['game'], game) # TODO: passing in partial MS deltas
-        Renderer.draw_game_board(RENDER_SURFACES['board'], game)
-
-        if game.hud_change:
-            Renderer.draw_hud(RENDER_SURFACES['hud'], game)
-            # TODO: pygame.display.update(game.hud)
-            game.hud_change = False # Reset
-
-        if game.menu_change:
-            Renderer.draw_menu(RENDER_SURFACES['menu'], game)
-            game.menu_change = False
+        # Game is caught up, render current game state part way into the next tick
+        alpha = min(loop_time_elapsed / LOOP_MS_PF, 1.0)
+        update_rects = render_frame(game, dirty_rects, profiler, alpha)
 
         # Renderer.full_blit(RENDER_SURFACES, "display")
 
@@ -57,18 +76,143 @@ def game_loop(game: Game, debug: bool):
             # pygame.display.set_caption("FPS: {0:2f}".format(fps))
             # Renderer.draw_debug("FPS: {0:2f}".format(fps))
             Renderer.draw_debug(f"FPS: {fps:2f}")
+            graph_rect = Renderer.draw_frame_graph(profiler, game)
+            if update_rects is not None:
+                update_rects.append(graph_rect)
 
-        pygame.display.flip()
+        timed(profiler, "flip", present, update_rects)
         # TODO: Reverse the flip and the clock tick?
         # Wait for next frame
-        FPS_CLOCK.tick(TARGET_FPS)
+        timed(profiler, "idle", FPS_CLOCK.tick, TARGET_FPS)
+        if profiler is not None:
+            profiler.end_frame()
+
+    if profiler is not None:
+        logging.info("Frame profile:\n" + profiler.report())
+        if profile_path is not None:
+            profiler.chrome_trace(profile_path)
 
     # Game Over!
-    ctypes.windll.user32.MessageBoxW(0, "You Win!", "Corinthian Football", 0)
+    game_over_message(game)
+
+def timed(profiler: FrameProfiler, phase: str, function, *args, **kwargs):
+    """Call function, timing it as a frame phase when profiling"""
+    if profiler is None:
+        return function(*args, **kwargs)
+    return profiler.time(phase, function, *args, **kwargs)
+
+def render_frame(game: Game, dirty_rects: bool, profiler: FrameProfiler = None, alpha: float = 1.0) -> list:
+    """Draw the current game state to the display surface, objects alpha of the way
+    from their previous to their current position.
+    Returns the display rects to update, or None when the whole screen needs a flip"""
+    game.damage_motion(alpha)
+    if dirty_rects and not game.full_redraw:
+        update_rects = list()
+        # Board damage is in world pixels, drawing is in view pixels
+        view = game.camera.view_rect
+        damaged = [game.camera.world_rect_to_view(rect).clip(view) for rect in game.take_damage()]
+        damaged = [rect for rect in damaged if rect.width and rect.height]
+        if damaged:
+            timed(profiler, "draw_game_board", Renderer.draw_game_board,
+                RENDER_SURFACES['board'], game, clip=damaged[0].unionall(damaged[1:]), alpha=alpha)
+            update_rects = Renderer.present_board_areas(RENDER_SURFACES['game'], game, damaged)
+    else:
+        update_rects = None # Full flip
+        # Board first: it's a subsurface of the game surface that draw_game puts on screen
+        timed(profiler, "draw_game_board", Renderer.draw_game_board, RENDER_SURFACES['board'], game, alpha=alpha)
+        timed(profiler, "draw_game", Renderer.draw_game, RENDER_SURFACES['game'], game)
+        game.take_damage() # Everything got drawn
+        game.full_redraw = False
+
+    if game.hud_change:
+        timed(profiler, "draw_hud", Renderer.draw_hud, RENDER_SURFACES['hud'], game)
+        if update_rects is not None:
+            update_rects.append(game.hud)
+        game.hud_change = False # Reset
+
+    if game.menu_change:
+        timed(profiler, "draw_menu", Renderer.draw_menu, RENDER_SURFACES['menu'], game)
+        if update_rects is not None:
+            update_rects.append(game.menu)
+        game.menu_change = False
+
+    return update_rects
+
+def present(update_rects: list):
+    if update_rects is None:
+        pygame.display.flip()
+    elif update_rects:
+        pygame.display.update(update_rects)
+
+# ----- Headless -----
+def demo_script(game: Game, frames: int) -> dict:
+    """Scripted session as {frame: [events]}: select the first player piece, path it to the
+    far end of its range and move there, while the cursor sweeps the board every frame"""
+    def motion(column, row):
+        x, y = game.camera.space_to_view(column, row)
+        half = game.camera.view_cell_size // 2
+        position = (game.board.x + x + half, game.board.y + y + half)
+        return pygame.event.Event(pygame.MOUSEMOTION, pos=position)
+
+    def click(column, row, button):
+        return [motion(column, row), pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=button)]
+
+    script = dict()
+    spaces = [space for space in game.grid if game.grid[space].actor is None]
+    for frame in range(frames):
+        column, row = spaces[frame % len(spaces)]
+        script[frame] = [motion(column, row)]
+
+    pieces = sorted((go for go in game.player_objects if go.selectable), key=lambda go: (go.x, go.y))
+    if pieces:
+        piece = game.point_to_space(*pieces[0].topleft)
+        reachable = range_find(piece, pieces[0].movement_range, game.grid)[1]
+        goal = max(reachable, key=lambda space: (reachable[space], space))
+        script[1] = click(*piece, BUTTON_LEFT_CLICK)
+        script[2] = click(*goal, BUTTON_RIGHT_CLICK)
+        script[3] = click(*goal, BUTTON_RIGHT_CLICK)
+    return script
+
+def headless_loop(game: Game, frames: int, script: dict = None, dirty_rects: bool = False, dump_path: str = None) -> FrameProfiler:
+    """Run frames updates and renders back to back, no frame cap, feeding script events
+    ({frame: [events]}) into the event queue. Optionally saves every frame as a PNG in dump_path.
+    Returns the profile of every frame"""
+    Renderer.register_display_surface(RENDER_SURFACES['display'])
+    Renderer.setup_background_board(game)
+    if dump_path is not None:
+        os.makedirs(dump_path, exist_ok=True)
+
+    profiler = FrameProfiler(capacity=max(1, frames))
+    for frame in range(frames):
+        if game.game_over:
+            break
+        for event in (script or dict()).get(frame, list()):
+            pygame.event.post(event)
+
+        profiler.begin_frame()
+        timed(profiler, "events", game.handle_events)
+        timed(profiler, "update", game.update)
+        update_rects = render_frame(game, dirty_rects, profiler)
+        timed(profiler, "flip", present, update_rects)
+        profiler.end_frame()
+
+        if dump_path is not None:
+            pygame.image.save(RENDER_SURFACES['display'], os.path.join(dump_path, f"frame_{frame:05d}.png"))
+
+    if game.game_over:
+        game_over_message(game)
+    return profiler
+
+def game_over_message(game: Game):
+    if game.winner == PLAYER:
+        message_box("You Win!", "Corinthian Football")
+    else:
+        message_box("You Lose!", "Corinthian Football")
 
 def game_load(level: int, game: Game):
     # Logic to load game objects into game state
     # Initial Load - Pull map/objects from file (JSON)
     # Load Map first to be able to add objects after
     LevelLoader.load_map(level_id=level, into_grid=game.grid)
-    LevelLoader.load_level(level_id=level, into_game=game)
\ No newline at end of file
+    LevelLoader.load_level(level_id=level, into_game=game)
+    game.enemy_ai.prepare(game.simulation) # Ready before the CPU's first turn
\ No newline at end of file
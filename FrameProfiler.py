@@ -0,0 +1,121 @@
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+PHASES = ["events", "update", "draw_game_board", "draw_game", "draw_hud", "draw_menu", "flip", "idle"]
+
+class FrameProfiler:
+    """Per-phase frame timings for the last capacity frames (ring buffer).
+    Each frame is a list of (phase, start, duration) in perf_counter seconds"""
+    def __init__(self, capacity: int = 600, budget_ms: float = None):
+        self.frames = deque(maxlen=capacity)
+        self.budget_ms = budget_ms # Frame time to flag frames against, if any
+        self.current = None
+        self.frame_count = 0
+
+    def begin_frame(self):
+        self.current = list()
+
+    def end_frame(self):
+        if self.current is not None:
+            self.frames.append(self.current)
+            self.frame_count += 1
+        self.current = None
+
+    def record(self, phase: str, start: float, duration: float):
+        if self.current is not None:
+            self.current.append((phase, start, duration))
+
+    def time(self, phase: str, function, *args, **kwargs):
+        """Call function, recording its wall time as phase"""
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.record(phase, start, time.perf_counter() - start)
+        return result
+
+    # Analysis
+    def phase_times(self, frame: list) -> dict:
+        """{phase: milliseconds} for one frame, repeated phases summed"""
+        times = dict()
+        for phase, _, duration in frame:
+            times[phase] = times.get(phase, 0.0) + duration * 1000
+        return times
+
+    def frame_ms(self, frame: list) -> float:
+        return sum(duration for _, _, duration in frame) * 1000
+
+    def busy_ms(self, frame: list) -> float:
+        """Frame time not spent waiting for the next frame"""
+        return sum(duration for phase, _, duration in frame if phase != "idle") * 1000
+
+    def percentiles(self, quantiles=(50, 95, 99)) -> dict:
+        """{phase: {"calls", "total", "mean", "p50", ..., "max"}} in ms over the buffered frames,
+        plus "frame" for whole frames. Percentiles are over the frames a phase ran in"""
+        samples = dict()
+        for frame in self.frames:
+            for phase, ms in self.phase_times(frame).items():
+                samples.setdefault(phase, list()).append(ms)
+            samples.setdefault("frame", list()).append(self.frame_ms(frame))
+
+        stats = dict()
+        for phase, values in samples.items():
+            values = np.array(values)
+            stats[phase] = {"calls": len(values), "total": float(values.sum()), "mean": float(values.mean())}
+            for quantile, value in zip(quantiles, np.percentile(values, quantiles)):
+                stats[phase][f"p{quantile}"] = float(value)
+            stats[phase]["max"] = float(values.max())
+        return stats
+
+    def over_budget(self) -> dict:
+        """{phase: frames} counting, for frames busy longer than the budget, which phase took the longest"""
+        culprits = dict()
+        if self.budget_ms is None:
+            return culprits
+        for frame in self.frames:
+            if self.busy_ms(frame) > self.budget_ms:
+                times = self.phase_times(frame)
+                times.pop("idle", None) # Waiting is never the culprit
+                if times:
+                    phase = max(times, key=times.get)
+                    culprits[phase] = culprits.get(phase, 0) + 1
+        return culprits
+
+    def report(self) -> str:
+        stats = self.percentiles()
+        order = [phase for phase in PHASES if phase in stats] + [phase for phase in stats if phase not in PHASES]
+        lines = [f"{'phase':<18}{'calls':>8}{'total ms':>12}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+        for phase in order:
+            s = stats[phase]
+            lines.append(f"{phase:<18}{s['calls']:>8}{s['total']:>12.2f}{s['mean']:>9.3f}"
+                f"{s['p50']:>9.3f}{s['p95']:>9.3f}{s['p99']:>9.3f}{s['max']:>9.3f}")
+
+        if self.budget_ms is not None and "frame" in stats:
+            culprits = self.over_budget()
+            over = sum(culprits.values())
+            line = f"{over} of {stats['frame']['calls']} frames over the {self.budget_ms:.1f} ms budget"
+            if culprits:
+                line += ", slowest phase: " + ", ".join(f"{phase} {count}" for phase, count in
+                    sorted(culprits.items(), key=lambda item: -item[1]))
+            lines.append(line)
+        return "\n".join(lines)
+
+    def chrome_trace(self, path: str):
+        """Write the buffered frames as Chrome trace events (chrome://tracing, Perfetto)"""
+        events = list()
+        origin = self.frames[0][0][1] if self.frames and self.frames[0] else 0.0
+        for index, frame in enumerate(self.frames):
+            if not frame:
+                continue
+            start = frame[0][1]
+            end = max(begin + duration for _, begin, duration in frame)
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                "ts": (start - origin) * 1e6, "dur": (end - start) * 1e6,
+                "args": {"frame": self.frame_count - len(self.frames) + index}})
+            for phase, begin, duration in frame:
+                events.append({"name": phase, "ph": "X", "pid": 1, "tid": 1,
+                    "ts": (begin - origin) * 1e6, "dur": duration * 1e6})
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
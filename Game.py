@@ -1,18 +1,29 @@
 import sys
 import logging
-import ctypes
 from functools import cache
 
 import pygame
 import pygame.mouse
 import pygame.event
 
-from Grid import Grid, path_find, path_reconstruct, range_find
-from objects import BaseObject, Moveable, Ball
+from Grid import Grid, tree_path_find
+from PathCache import PathCache
+from Camera import Camera
+from Simulation import Simulation, CPU, PICKUP, BOUNCE, VICTORY
+from TreeSearch import TreeSearch
+from objects import BaseObject, Moveable, Ball, Renderable
+from renderers import RenderList, build_renderer, LAYER_DECALS, LAYER_BALL, LAYER_UNITS, LAYER_CARRIED
 import Menu
-from constants import ENEMY_TURN, VICTORY_EVENT, BUTTON_LEFT_CLICK, BUTTON_RIGHT_CLICK
+from constants import ENEMY_TURN, BUTTON_LEFT_CLICK, BUTTON_RIGHT_CLICK
 from constants import PLAYER_IDLE, PLAYER_SELECTED, PLAYER_PATHING, PLAYER_MOVING
 
+ZOOM_STEP = 1.25 # Zoom factor per mouse wheel notch
+AI_TIME_LIMIT = 0.25 # Seconds the CPU may think per turn
+
+# Utilizing pygame custom events
+VICTORY_EVENT = pygame.USEREVENT+1 # winner: team
+CPU_TURN_DONE_EVENT = pygame.USEREVENT+2 # Hands the turn back once the CPU's transition has finished
+
 # State Machine import
 from transitions import Machine
 from StateMachine import STATES, TRANSITIONS
@@ -51,9 +62,20 @@ class Game:
         self.player_objects = set()
         self.cpu_objects = set()
         self.neutral_objects = set()
+        # Renderable objects in draw order, maintained by spawn/despawn
+        self.render_list = RenderList()
 
         # Game grid (graph for location/movement/pathfinding)
         self.grid = Grid()
+        # Search results reused until the board changes (see Grid.version)
+        self.path_cache = PathCache(self.grid)
+        self.grid.subscribe(self.grid_changed)
+        # Rules and board state; Game animates and displays what it reports
+        self.simulation = Simulation(self.grid)
+        # CPU player: searches its turn on a copy of the simulation
+        self.enemy_ai = TreeSearch(CPU, time_limit=AI_TIME_LIMIT)
+        # Board viewport: scroll/zoom over boards larger than the screen area
+        self.camera = Camera(self.grid, cell_size, board.size)
 
         # Game state variables
         self.selected_object = None # type: BaseObject
@@ -61,6 +83,7 @@ class Game:
         self.selected_range = None # type: dict
 
         self.game_over = False # Win/loss condition
+        self.winner = None # Team that won, once game_over
 
         self.hud_change = True # Need to evaulate HUD on initialization
         self.hud_dictionary = dict()
@@ -70,7 +93,8 @@ class Game:
         # }
         self.menu_buttons = list[Menu.MenuItem]()
 
-        self.game_cursor_x = None
+        self.mouse_position = None # Last screen position seen
+        self.game_cursor_x = None # Board (world) pixels under the cursor
         self.game_cursor_y = None
         self.menu_cursor = None
 
@@ -78,28 +102,49 @@ class Game:
         self.cursor_on_menu = False
         self.cursor_in_grid = False
         self.cursor_on_button = -1
+        self.hover_space = None # Grid space under the cursor, None off the grid
+
+        # Dirty-rect tracking: board-relative regions changed since the last draw
+        self.damaged_rects = list()
+        self.full_redraw = True # Whole frame needs drawing (first frame, layout changes)
+        # Interpolated drawing: objects that moved in the latest update,
+        # and where the ones drawn between ticks were last drawn
+        self.moved_objects = set()
+        self.drawn_rects = dict()
 
         self.keydown_handlers = dict()
         self.keyup_handlers = dict()
+        # Camera scrolling, a cell per key press
+        self.keydown_handlers[pygame.K_LEFT] = [lambda: self.scroll_camera(-1, 0)]
+        self.keydown_handlers[pygame.K_RIGHT] = [lambda: self.scroll_camera(1, 0)]
+        self.keydown_handlers[pygame.K_UP] = [lambda: self.scroll_camera(0, -1)]
+        self.keydown_handlers[pygame.K_DOWN] = [lambda: self.scroll_camera(0, 1)]
 
     def handle_event(self, event: pygame.event.Event):
         if event.type == pygame.QUIT:
             pygame.quit()
             sys.exit(0)
         elif event.type == pygame.KEYDOWN:
-            for handler in self.keydown_handlers[event.key]:
+            for handler in self.keydown_handlers.get(event.key, []):
                 handler()
         elif event.type == pygame.KEYUP:
-            for handler in self.keyup_handlers[event.key]:
+            for handler in self.keyup_handlers.get(event.key, []):
                 handler()
         elif event.type == pygame.MOUSEMOTION:
-            self.mouse_motion_handler()
+            self.mouse_motion_handler(event.pos)
+        elif event.type == pygame.MOUSEWHEEL:
+            if self.cursor_on_board:
+                self.zoom_camera(ZOOM_STEP ** event.y)
         elif event.type == pygame.MOUSEBUTTONDOWN:
             # logging.info("Clicked: ({0:d}, {1:d})".format(self.cursor_x, self.cursor_y))
             if self.state not in {PLAYER_MOVING, ENEMY_TURN}:
                 self.mouse_button_handler(event.button)
         elif event.type == VICTORY_EVENT:
+            self.winner = event.winner
             self.game_over = True
+        elif event.type == CPU_TURN_DONE_EVENT:
+            if self.state == ENEMY_TURN and not self.game_over:
+                self.end_turn()
 
     def handle_events(self):
         for event in pygame.event.get():
@@ -145,17 +190,124 @@ class Game:
 
         return result
 
+    # Game Objects
+    def spawn(self, go: BaseObject, team: str = "neutral", space: tuple = None):
+        """Add a game object to the game, its team ('player', 'cpu', 'neutral') and the render list,
+        placing it on the board at space when given"""
+        self.game_objects.add(go) # set uses 'add', list uses 'append'
+        self.team_objects(team).add(go)
+        if space is not None:
+            self.simulation.add(go, team, space)
+        if isinstance(go, Renderable):
+            if go.renderer is None:
+                go.renderer = build_renderer(go, team)
+            self.render_list.add(go, self.render_layer(go))
+            self.damage_rect(go)
+
+    def despawn(self, go: BaseObject):
+        self.simulation.remove(go)
+        self.game_objects.discard(go)
+        for team_objects in (self.player_objects, self.cpu_objects, self.neutral_objects):
+            team_objects.discard(go)
+        if go in self.render_list:
+            self.render_list.remove(go)
+            self.damage_rect(go)
+
+    def team_objects(self, team: str) -> set:
+        return {"player": self.player_objects, "cpu": self.cpu_objects}.get(team, self.neutral_objects)
+
+    def render_layer(self, go: BaseObject) -> int:
+        if isinstance(go, Ball):
+            carried = any(actor.carrying is go for actor in self.game_objects)
+            return LAYER_CARRIED if carried else LAYER_BALL
+        if not go.solid and not isinstance(go, Moveable):
+            return LAYER_DECALS
+        return LAYER_UNITS
+
+    # Damage Tracking
+    def damage_rect(self, rect: pygame.Rect):
+        self.damaged_rects.append(pygame.Rect(rect))
+
+    def damage_space(self, column: int, row: int):
+        x, y = self.space_to_point(column, row)
+        # Plus one for the grid line hangover, like the board itself
+        self.damaged_rects.append(pygame.Rect(x, y, self.cell_size + 1, self.cell_size + 1))
+
+    def damage_spaces(self, spaces):
+        if spaces is not None:
+            for column, row in spaces:
+                self.damage_space(column, row)
+
+    def damage_object(self, go: BaseObject):
+        self.damage_rect(go)
+        if go is self.selected_object: # Selection highlight follows it cell by cell
+            self.damage_space(*self.point_to_space(*go.topleft))
+
+    def damage_motion(self, alpha: float):
+        """Damage where moving objects were last drawn and where they are drawn at alpha"""
+        for go in self.moved_objects.union(self.drawn_rects):
+            rect = go.interpolated_rect(alpha)
+            last_rect = self.drawn_rects.pop(go, None)
+            if rect != last_rect:
+                if last_rect is not None:
+                    self.damage_rect(last_rect)
+                self.damage_rect(rect)
+            if go.interpolating:
+                self.drawn_rects[go] = rect
+
+    def grid_changed(self, space, terrain_changed: bool):
+        # Terrain shows on the board (actors are damaged as they move)
+        if terrain_changed:
+            if space is None:
+                self.full_redraw = True
+            else:
+                self.damage_space(*space)
+
+    def damage_selection(self):
+        """Damage everything drawn for the current selection: range, path and highlight"""
+        self.damage_spaces(self.selected_range)
+        self.damage_spaces(self.selected_path)
+        if self.selected_object is not None:
+            self.damage_space(*self.point_to_space(*self.selected_object.topleft))
+
+    def take_damage(self) -> list:
+        """Damaged board rects since the last call (clears them)"""
+        damaged = self.damaged_rects
+        self.damaged_rects = list()
+        return damaged
+
+    # Camera
+    def scroll_camera(self, columns: int, rows: int):
+        size = self.camera.view_cell_size
+        self.camera.scroll(columns * size, rows * size)
+        self.camera_change()
+
+    def zoom_camera(self, factor: float):
+        anchor = None
+        if self.cursor_on_board:
+            anchor = (self.mouse_position[0] - self.board.x, self.mouse_position[1] - self.board.y)
+        self.camera.zoom_to(self.camera.zoom * factor, anchor)
+        self.camera_change()
+
+    def camera_change(self):
+        # Every view pixel moved, and the cursor now points at another board spot
+        self.full_redraw = True
+        if self.mouse_position is not None:
+            self.mouse_motion_handler(self.mouse_position)
+
     # Mouse Handling
-    def mouse_motion_handler(self):
-        mouse_position = pygame.mouse.get_pos()
+    def mouse_motion_handler(self, mouse_position: tuple = None):
+        if mouse_position is None:
+            mouse_position = pygame.mouse.get_pos()
+        self.mouse_position = mouse_position
 
         # Set board-relative cursor
         self.cursor_on_board = self.board_collision_check(mouse_position[0], mouse_position[1])
         self.cursor_on_menu = self.menu_collision_check(mouse_position)
 
         if self.cursor_on_board:
-            self.game_cursor_x = mouse_position[0] - self.board.x
-            self.game_cursor_y = mouse_position[1] - self.board.y
+            self.game_cursor_x, self.game_cursor_y = self.camera.view_to_world(
+                mouse_position[0] - self.board.x, mouse_position[1] - self.board.y)
             self.cursor_in_grid = self.grid_collision_check(self.game_cursor_x, self.game_cursor_y)
 
             self.menu_cursor = None
@@ -170,6 +322,20 @@ class Game:
             self.menu_cursor = tuple(map(lambda x, y: x - y, mouse_position, self.menu.topleft))
             self.cursor_on_button = self.button_collision_check(*self.menu_cursor)
 
+        self.hover_change()
+
+    def hover_change(self):
+        # Only a change of hovered cell needs redrawing, not every pixel of motion
+        hover_space = None
+        if self.cursor_in_grid: # Same condition the hover fill is drawn on
+            hover_space = self.point_to_space(self.game_cursor_x, self.game_cursor_y)
+        if hover_space != self.hover_space:
+            if self.hover_space is not None:
+                self.damage_space(*self.hover_space)
+            if hover_space is not None:
+                self.damage_space(*hover_space)
+            self.hover_space = hover_space
+
     def mouse_button_handler(self, button: int):     
         # logging.info("cursor_on_button: {0:d}".format(self.cursor_on_button))
         if self.cursor_in_grid:
@@ -206,6 +372,7 @@ class Game:
         self.hud_change = True
 
     def player_deselect_object(self, column=0, row=0):
+        self.damage_selection()
         self.selected_object = None
         self.selected_path = None # Deselect any selected path
         self.selected_range = None
@@ -213,9 +380,11 @@ class Game:
     def player_select_object(self, column, row):
         clicked_object = self.actor_in_space(column, row) # Object or None
         if clicked_object in self.player_objects:
+            self.damage_selection() # Previous selection, if re-selecting
             self.selected_object = clicked_object
             # Build/display movement range (frontier, breadth-first)
-            self.selected_range, _ = range_find((column, row), self.selected_object.movement_range, self.grid)
+            self.selected_range, _ = self.path_cache.range_find((column, row), self.selected_object.movement_range)
+            self.damage_selection()
 
     def player_select_path(self, column, row):
         # starting_column = self.selected_object.x // self.cell_size
@@ -224,10 +393,12 @@ class Game:
         start = self.point_to_space(self.selected_object.x, self.selected_object.y)
         goal = (column, row)
 
-        came_from, _ = path_find(start, goal, self.grid)
-        path = path_reconstruct(start, goal, came_from)
+        # valid_goal_selected keeps goals inside the movement range: walk its shortest-path tree back
+        path = tree_path_find(start, goal, self.grid, self.selected_range)
 
+        self.damage_spaces(self.selected_path)
         self.selected_path = path
+        self.damage_spaces(self.selected_path)
         logging.info(self.selected_path)
 
     def menu_clear(self):
@@ -260,45 +431,49 @@ class Game:
         start = self.selected_path.pop()
         # goal = 
         self.target_node = self.selected_path[-1] # last
+        # Popped node, and the new tail whose path segment from it is gone
+        self.damage_space(*start)
+        self.damage_space(*self.target_node)
 
-        self.grid[start] = None, self.grid[start].terrain
+        self.simulation.leave(self.selected_object)
         # self.end_moving()
 
     def finalize_move(self):
         goal = self.selected_path[0]
         self.evaluate_goal_arrival(self.selected_object, goal)
 
+        self.damage_selection()
         self.target_node = None
         self.selected_object = None
         self.selected_path = None
 
     def begin_policy_evaulation(self):
-        # AI decision making - Enemy Turn
-        # TODO: Placeholder. Remove when AI is implemented
-        ctypes.windll.user32.MessageBoxW(0, "Now it's your turn", "Enemy Says:", 0)
-        # self.end_turn()
+        # AI decision making - Enemy Turn: search, play the chosen moves, hand the turn back.
+        # Runs inside the END_TURN transition, so the hand back is queued, not triggered here
+        for actor, goal in self.enemy_ai.plan(self.simulation):
+            self.simulation.leave(actor)
+            actor.move_to(*self.space_to_point(*goal)) # Carried ball comes along
+            self.evaluate_goal_arrival(actor, goal)
+            if self.simulation.game_over:
+                return
+        pygame.event.post(pygame.event.Event(CPU_TURN_DONE_EVENT))
+
+    def simulation_end_turn(self):
+        self.simulation.end_turn()
+        if self.simulation.team_to_move != CPU:
+            # Any pool/board setup for the CPU's next turn happens on the player's time
+            self.enemy_ai.prepare(self.simulation)
 
-    # TODO: Probably should move this into some kind of resolution priority switcher
     def evaluate_goal_arrival(self, actor: Moveable, goal):
-        target, terrain = self.grid[goal]
-        # TODO: Need to build priority Dict for switch/case on target and terrain
-        # Priority 1: Game Enders
-        if terrain == "Endzone" and isinstance(actor.carrying, Ball):
-            # TODO: Increment points, reset scrimmage
-            pygame.event.post(pygame.event.Event(VICTORY_EVENT))
-        # Priority 2: Ball events
-        elif isinstance(target, Ball):
-            if actor.can_carry and not actor.carrying:
-                actor.carrying = target
-            else:
-                # Bounce the ball away, Blood Bowl style
-                bounce_space = self.grid.random_neighbor(goal)
-                _, bounce_terrain = self.grid[bounce_space]
-                target.move_to(*self.space_to_point(*bounce_space))
-                self.grid[bounce_space] = target, bounce_terrain
-                # TODO: More deterministic bounce
-
-        self.grid[goal] = actor, terrain
+        # Rules live in the Simulation, the UI just shows the outcomes
+        for outcome in self.simulation.arrive(actor, goal):
+            if outcome[0] == VICTORY:
+                pygame.event.post(pygame.event.Event(VICTORY_EVENT, winner=outcome[1]))
+            elif outcome[0] == PICKUP:
+                self.render_list.set_layer(outcome[2], LAYER_CARRIED)
+            elif outcome[0] == BOUNCE:
+                _, ball, bounce_space = outcome
+                ball.move_to(*self.space_to_point(*bounce_space))
 
     # Game Update call (frame)
     def update(self):
@@ -312,14 +487,22 @@ class Game:
                 if len(self.selected_path) == 1: # We've arrived
                     self.end_moving()
                 else: # There's path nodes left, pop and move on
-                    self.selected_path.pop()
+                    self.damage_space(*self.selected_path.pop())
                     self.target_node = self.selected_path[-1]
+                    self.damage_space(*self.target_node)
             else:
                 self.selected_object.partial_move(*target)
 
         # Update of all game objects
+        self.moved_objects.clear()
         for go in self.game_objects:
+            moving = isinstance(go, Moveable) and (go.moving_x or go.moving_y)
+            if moving:
+                self.damage_object(go) # Where it was
             go.update()
+            if moving:
+                self.damage_object(go) # Where it is now
+                self.moved_objects.add(go)
 
         # TODO: Need to add DI update logic (collision_handler)
 
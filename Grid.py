@@ -2,18 +2,25 @@ import logging
 import random
 
 from collections import namedtuple
-from typing import NamedTuple
-from queue import PriorityQueue
+from typing import NamedTuple, TYPE_CHECKING
+from heapq import heappush, heappop
+from concurrent.futures import ProcessPoolExecutor
 
-from objects import BaseObject
+import numpy as np
+
+import DistanceField
+import JumpPoint
 
 from constants import NORTH, SOUTH, EAST, WEST
 
+if TYPE_CHECKING: # Annotations only: the grid (and Simulation on top of it) runs without pygame
+    from objects import BaseObject
+
 Space = namedtuple("Space", ["x", "y"])
 # TODO: Big TODO - Re-implement space with z/t value for terrain???
 # SpaceMeta = namedtuple("SpaceMeta", ["actor", "terrain"], defaults=[None, "Blank"])
 class SpaceMeta(NamedTuple):
-    actor: BaseObject
+    actor: "BaseObject"
     terrain: str = "Blank"
 
 DIRECTIONS = [NORTH, SOUTH, WEST, EAST] # Maintained order, just cuz
@@ -30,91 +37,488 @@ def grid_space_add(a: Space, b: Space) -> Space:
 def grid_space_neighbor(space: Space, direction: int) -> Space:
     return grid_space_add(space, grid_direction(direction))
 
-class Grid(dict):
+# Terrain registry: terrain code (array value) <-> terrain name (SpaceMeta value)
+NO_TERRAIN = -1 # Code for coordinates that are not part of the board
+EMPTY = -1 # Occupancy code for a space without an actor
+TERRAIN_TYPES = ["Blank", "Endzone", "Grass", "Mud"]
+TERRAIN_CODES = {name: code for code, name in enumerate(TERRAIN_TYPES)}
+# Default movement cost to enter a space of each terrain (unlisted terrain costs 1)
+TERRAIN_COSTS = {
+    "Blank": 1,
+    "Endzone": 1,
+    "Grass": 2,
+    "Mud": 3
+}
+
+# Zobrist hashing: every (kind, x, y, value) feature of a board gets a fixed random 64-bit key,
+# and a board's key is the XOR of its features, so changing one space is two XORs.
+# Keys come from a hash of the feature rather than a stored table: boards of any size,
+# and the same keys in every process
+ZOBRIST_MASK = (1 << 64) - 1
+ZOBRIST_PRIME = 1000003
+ZOBRIST_TERRAIN = 1 # value: terrain code
+ZOBRIST_ACTOR = 2 # value: actor index << 16 | carried actor index + 1
+ZOBRIST_TURN = 3 # Not a grid feature, for Simulation's turn state
+
+def zobrist_key(kind: int, x: int, y: int, value: int) -> int:
+    """splitmix64 of the packed feature"""
+    z = ((((kind * ZOBRIST_PRIME + x) * ZOBRIST_PRIME + y) * ZOBRIST_PRIME + value) + 0x9E3779B97F4A7C15) & ZOBRIST_MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & ZOBRIST_MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & ZOBRIST_MASK
+    return z ^ (z >> 31)
+
+def zobrist_keys(kind: int, x: np.ndarray, y: np.ndarray, value: np.ndarray) -> np.ndarray:
+    """zobrist_key over arrays, with the same results (uint64 arithmetic wraps like the masking)"""
+    u = np.uint64
+    z = ((u(kind) * u(ZOBRIST_PRIME) + x.astype(u)) * u(ZOBRIST_PRIME) + y.astype(u)) * u(ZOBRIST_PRIME) + value.astype(u)
+    z = z + u(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> u(30))) * u(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> u(27))) * u(0x94D049BB133111EB)
+    return z ^ (z >> u(31))
+
+def terrain_code(terrain: str) -> int:
+    """Array code for a terrain name, registering unknown terrain on first use"""
+    code = TERRAIN_CODES.get(terrain)
+    if code is None:
+        code = len(TERRAIN_TYPES)
+        TERRAIN_TYPES.append(terrain)
+        TERRAIN_CODES[terrain] = code
+    return code
+
+class Grid:
+    """Board graph backed by NumPy arrays, indexed [x, y]:
+    terrain codes, actor (occupancy) indices, a solid mask and per-space entry costs.
+    Keeps the mapping API of the old dict grid: grid[x, y] gives a SpaceMeta,
+    grid[x, y] = actor, terrain sets one, and iteration yields Spaces row by row."""
+    def __init__(self, width: int = 0, height: int = 0):
+        self.width = 0
+        self.height = 0
+        self.terrain = np.full((0, 0), NO_TERRAIN, dtype=np.int8)
+        self.occupancy = np.full((0, 0), EMPTY, dtype=np.int32)
+        self.solid = np.zeros((0, 0), dtype=bool)
+        self.costs = np.zeros((0, 0), dtype=np.int32)
+        self.terrain_costs = dict(TERRAIN_COSTS) # Per-grid copy, see set_terrain_costs
+
+        # Actor registry: occupancy index -> actor (None for a freed slot), actor -> occupancy index
+        self.actors = list()
+        self.actor_indices = dict()
+        self.free_indices = list() # Released slots, reused before the registry grows
+
+        self.space_count = 0
+        self.version = 0 # Bumped whenever terrain or occupancy changes
+        self.zobrist = 0 # 64-bit board key: terrain, actors and what they carry (see zobrist_key)
+        self.actor_keys = np.zeros((0, 0), dtype=np.uint64) # Zobrist key of each space's actor, 0 when empty
+        self.listeners = list() # Change callbacks, see subscribe
+        self.clear_caches()
+        self.reserve(width, height)
+
+    def load_terrain(self, codes: np.ndarray):
+        """Bulk-set terrain codes for a whole [x, y] board (NO_TERRAIN for holes), clearing actors"""
+        self.reserve(*codes.shape)
+        self.terrain[...] = NO_TERRAIN
+        self.terrain[:codes.shape[0], :codes.shape[1]] = codes
+        self.occupancy[...] = EMPTY
+        self.solid[...] = False
+        self.actors.clear()
+        self.actor_indices.clear()
+        self.free_indices.clear()
+
+        cost_table = np.array([self.terrain_costs.get(name, 1) for name in TERRAIN_TYPES], dtype=np.int32)
+        on_board = self.terrain != NO_TERRAIN
+        self.costs[...] = 0
+        self.costs[on_board] = cost_table[self.terrain[on_board]]
+
+        self.space_count = int(on_board.sum())
+        self.actor_keys[...] = 0
+        self.rehash()
+        self.clear_caches()
+        self.version += 1
+        self.notify(None, True)
+
+    def snapshot(self) -> "Grid":
+        """Actor-free copy for searching elsewhere (e.g. worker processes).
+        Keeps terrain, costs and the solid mask; drops actors and listeners so it pickles small"""
+        snapshot = Grid()
+        snapshot.width, snapshot.height = self.width, self.height
+        snapshot.terrain = self.terrain.copy()
+        snapshot.occupancy = np.full_like(self.occupancy, EMPTY)
+        snapshot.solid = self.solid.copy()
+        snapshot.costs = self.costs.copy()
+        snapshot.terrain_costs = dict(self.terrain_costs)
+        snapshot.space_count = self.space_count
+        snapshot.version = self.version
+        snapshot.actor_keys = np.zeros_like(self.actor_keys)
+        snapshot.rehash()
+        return snapshot
+
+    def subscribe(self, listener):
+        """Register listener(space, terrain_changed) for every change to a space.
+        space is None when the whole board changed (resize, cost table)"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, space: Space, terrain_changed: bool):
+        for listener in self.listeners:
+            listener(space, terrain_changed)
+
+    def clear_caches(self):
+        # Flat lists/summaries for the search engines, rebuilt lazily after any change
+        self.walkable_cache = None
+        self.walkable_padded_cache = None
+        self.horizontal_jumps_cache = None
+        self.cost_cache = None
+        self.cost_range_cache = None
+
+    def reserve(self, width: int, height: int):
+        """Grow the backing arrays to at least width x height (never shrinks)"""
+        width = max(width, self.width)
+        height = max(height, self.height)
+        if width == self.width and height == self.height:
+            return
+
+        terrain = np.full((width, height), NO_TERRAIN, dtype=np.int8)
+        occupancy = np.full((width, height), EMPTY, dtype=np.int32)
+        solid = np.zeros((width, height), dtype=bool)
+        costs = np.zeros((width, height), dtype=np.int32)
+        actor_keys = np.zeros((width, height), dtype=np.uint64)
+
+        terrain[:self.width, :self.height] = self.terrain
+        occupancy[:self.width, :self.height] = self.occupancy
+        solid[:self.width, :self.height] = self.solid
+        costs[:self.width, :self.height] = self.costs
+        actor_keys[:self.width, :self.height] = self.actor_keys
+
+        self.terrain, self.occupancy, self.solid, self.costs = terrain, occupancy, solid, costs
+        self.actor_keys = actor_keys
+        self.width, self.height = width, height
+        self.clear_caches()
+        self.notify(None, True)
+
+    def actor_index(self, actor: "BaseObject") -> int:
+        if actor is None:
+            return EMPTY
+        index = self.actor_indices.get(actor)
+        if index is None:
+            if self.free_indices:
+                index = self.free_indices.pop()
+                self.actors[index] = actor
+            else:
+                index = len(self.actors)
+                self.actors.append(actor)
+            self.actor_indices[actor] = index
+        return index
+
+    def release_actor(self, actor: "BaseObject"):
+        """Forget an actor leaving the game (clearing any space it still holds) so it can be
+        garbage collected; its occupancy index is reused by the next new actor"""
+        index = self.actor_indices.pop(actor, None)
+        if index is None:
+            return
+        for x, y in np.argwhere(self.occupancy == index).tolist():
+            self[x, y] = None, TERRAIN_TYPES[self.terrain[x, y]]
+        self.actors[index] = None
+        self.free_indices.append(index)
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
     def __setitem__(self, key, values):
         x,y = key
-        # print(values)
-        super().__setitem__(Space(x, y), SpaceMeta(*values))
+        if x < 0 or y < 0:
+            raise KeyError(key)
+        actor, terrain = SpaceMeta(*values)
+        if not self.in_bounds(x, y):
+            # Amortized growth for maps loaded without a reserve() call
+            self.reserve(max(self.width * 2, x + 1) if x >= self.width else self.width,
+                max(self.height * 2, y + 1) if y >= self.height else self.height)
+
+        code = terrain_code(terrain)
+        index = self.actor_index(actor)
+        actor_key = 0
+        if actor is not None:
+            carried = self.actor_index(actor.carrying) if actor.carrying is not None else EMPTY
+            actor_key = zobrist_key(ZOBRIST_ACTOR, x, y, index << 16 | carried + 1)
+        old_actor_key = int(self.actor_keys[x, y])
+        if self.terrain[x, y] == code and self.occupancy[x, y] == index and old_actor_key == actor_key:
+            return # Nothing changed, keep the version (and caches keyed on it)
+
+        terrain_changed = self.terrain[x, y] != code
+        if terrain_changed:
+            if self.terrain[x, y] != NO_TERRAIN:
+                self.zobrist ^= zobrist_key(ZOBRIST_TERRAIN, x, y, int(self.terrain[x, y]))
+            self.zobrist ^= zobrist_key(ZOBRIST_TERRAIN, x, y, code)
+        self.zobrist ^= old_actor_key ^ actor_key
+        self.actor_keys[x, y] = actor_key
+        if self.terrain[x, y] == NO_TERRAIN:
+            self.space_count += 1
+        self.terrain[x, y] = code
+        self.occupancy[x, y] = index
+        self.solid[x, y] = actor is not None and actor.solid
+        self.costs[x, y] = self.terrain_costs.get(terrain, 1)
+        self.clear_caches()
+        self.version += 1
+        self.notify(Space(x, y), terrain_changed)
+
+    def rehash(self):
+        """Recompute the Zobrist key from scratch (bulk changes); __setitem__ keeps it up to date"""
+        xs, ys = np.nonzero(self.terrain != NO_TERRAIN)
+        keys = zobrist_keys(ZOBRIST_TERRAIN, xs, ys, self.terrain[xs, ys])
+        self.zobrist = int(np.bitwise_xor.reduce(keys, initial=np.uint64(0))) ^ \
+            int(np.bitwise_xor.reduce(self.actor_keys, axis=None, initial=np.uint64(0)))
+
+    def set_terrain_costs(self, terrain_costs: dict):
+        """Override entry costs per terrain name and re-derive the whole cost array at once"""
+        self.terrain_costs.update(terrain_costs)
+        for terrain in terrain_costs:
+            terrain_code(terrain)
+
+        cost_table = np.array([self.terrain_costs.get(name, 1) for name in TERRAIN_TYPES], dtype=np.int32)
+        on_board = self.terrain != NO_TERRAIN
+        self.costs[on_board] = cost_table[self.terrain[on_board]]
+        self.clear_caches()
+        self.version += 1
+        self.notify(None, False)
 
     def __getitem__(self, key) -> SpaceMeta:
         x,y = key
-        return super().__getitem__(Space(x, y))
+        if not (self.in_bounds(x, y) and self.terrain[x, y] != NO_TERRAIN):
+            raise KeyError(key)
+        index = self.occupancy[x, y]
+        actor = self.actors[index] if index != EMPTY else None
+        return SpaceMeta(actor, TERRAIN_TYPES[self.terrain[x, y]])
+
+    def __contains__(self, key) -> bool:
+        try:
+            x,y = key
+        except (TypeError, ValueError):
+            return False
+        return self.in_bounds(x, y) and self.terrain[x, y] != NO_TERRAIN
+
+    def __len__(self) -> int:
+        return self.space_count
+
+    def __iter__(self):
+        # Row-major (y, then x), matching the order maps are read in
+        for y, x in np.argwhere(self.terrain.T != NO_TERRAIN).tolist():
+            yield Space(x, y)
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        for space in self:
+            yield self[space]
+
+    def items(self):
+        for space in self:
+            yield space, self[space]
+
+    def get(self, key, default=None) -> SpaceMeta:
+        return self[key] if key in self else default
+
+    def passable(self, x: int, y: int) -> bool:
+        """In the board and not blocked by a solid actor"""
+        return self.in_bounds(x, y) and self.terrain[x, y] != NO_TERRAIN and not self.solid[x, y]
+
+    def walkable_mask(self) -> np.ndarray:
+        return (self.terrain != NO_TERRAIN) & ~self.solid
+
+    def terrain_mask(self, terrain: str) -> np.ndarray:
+        return self.terrain == terrain_code(terrain)
+
+    def space_mask(self, spaces) -> np.ndarray:
+        mask = np.zeros((self.width, self.height), dtype=bool)
+        for x, y in spaces:
+            mask[x, y] = True
+        return mask
+
+    def distance_field(self, sources, max_distance: int = None) -> np.ndarray:
+        """Movement cost from the nearest source to every cell (entry costs, like range_find
+        from the source), computed over whole arrays. Costs of max_distance or more are np.inf.
+        Sources are spaces (e.g. actor positions) or a [x, y] bool mask (e.g. terrain_mask)"""
+        if not isinstance(sources, np.ndarray):
+            sources = self.space_mask(sources)
+        if self.uniform_cost():
+            # Plain wavefront counts steps; scale them by the one step cost
+            step_cost = self.min_cost()
+            max_steps = None if max_distance is None else -(-max_distance // step_cost)
+            return DistanceField.distance_field(self.walkable_mask(), sources, max_steps) * step_cost
+        return DistanceField.weighted_distance_field(self.walkable_mask(), self.costs, sources, max_distance)
+
+    def flow_field(self, sources, max_distance: int = None) -> np.ndarray:
+        """Per-cell direction (NORTH/SOUTH/WEST/EAST) of the next step toward the nearest source"""
+        return DistanceField.flow_field(self.distance_field(sources, max_distance))
+
+    def walkable_flat(self) -> list:
+        """Passability per flat index (x * height + y), as a plain list for fast scalar reads"""
+        if self.walkable_cache is None:
+            self.walkable_cache = self.walkable_mask().ravel().tolist()
+        return self.walkable_cache
+
+    def walkable_padded(self) -> list:
+        """walkable_flat with a blocked one-cell border, flat index (x + 1) * (height + 2) + y + 1"""
+        if self.walkable_padded_cache is None:
+            self.walkable_padded_cache = np.pad(self.walkable_mask(), 1).ravel().tolist()
+        return self.walkable_padded_cache
+
+    def horizontal_jumps(self) -> tuple:
+        """JumpPoint.horizontal_jumps over walkable_padded's board"""
+        if self.horizontal_jumps_cache is None:
+            self.horizontal_jumps_cache = JumpPoint.horizontal_jumps(np.pad(self.walkable_mask(), 1))
+        return self.horizontal_jumps_cache
 
     def neighbors(self, space: Space):
         # space = Space(coordinates)
-        for d in DIRECTIONS:
-            neighbor = grid_space_neighbor(space, d)
-            if neighbor in self:
-                neighbor_object = self[neighbor].actor
-                if neighbor_object is None or not neighbor_object.solid: # Can't traverse through solid objects
-                    yield neighbor
-
-    def random_neighbor(self, space: Space) -> Space:
+        x, y = space
+        for dx, dy in GRID_DIRECTIONS:
+            if self.passable(x + dx, y + dy): # Can't traverse through solid objects
+                yield Space(x + dx, y + dy)
+
+    def random_neighbor(self, space: Space, rng: random.Random = random) -> Space:
         valid_neighbors = list(self.neighbors(space))
         logging.info(valid_neighbors)
         # random.shuffle(valid_neighbors) # TODO: Unnecessary?
-        r = random.randint(0, len(valid_neighbors) - 1)
+        r = rng.randint(0, len(valid_neighbors) - 1)
         result = valid_neighbors[r]
         return result
 
     def cost(self, start: Space, end: Space):
-        return 1 # TODO: More complex movement cost
-
-# A* Pathfinding 
-def path_find(start: tuple, goal: tuple, graph: Grid):
-    """Pathfinding graph algorithm"""
-    start = Space(*start)
-    goal = Space(*goal)
-
-    frontier = PriorityQueue()
-    frontier.put((0, start))
-
-    came_from = dict()
-    came_from[start] = None
+        """Cost of stepping from start into end (set by end's terrain)"""
+        return int(self.costs[end[0], end[1]])
+
+    def cost_flat(self) -> list:
+        """Entry cost per flat index (x * height + y), as a plain list for the search engines"""
+        if self.cost_cache is None:
+            self.cost_cache = self.costs.ravel().tolist()
+        return self.cost_cache
+
+    def cost_range(self) -> tuple:
+        """(cheapest, dearest) entry cost on the board"""
+        if self.cost_range_cache is None:
+            board_costs = self.costs[self.terrain != NO_TERRAIN]
+            if board_costs.size:
+                self.cost_range_cache = (int(board_costs.min()), int(board_costs.max()))
+            else:
+                self.cost_range_cache = (1, 1)
+        return self.cost_range_cache
+
+    def min_cost(self) -> int:
+        """Cheapest step on the board, scales the Manhattan heuristic so it stays admissible"""
+        return self.cost_range()[0]
+
+    def uniform_cost(self) -> bool:
+        """Every step costs the same (lets path_find use Jump Point Search)"""
+        cheapest, dearest = self.cost_range()
+        return cheapest == dearest
+
+# ----- Search Engine -----
+# Searches run over flat cell indices (x * height + y) with a plain heapq frontier:
+# no locking, a closed set so stale heap entries are skipped instead of re-expanded,
+# and (priority, heuristic, insertion order, index) entries so ties never compare Spaces.
+def heap_search(graph: Grid, start: tuple, goal: tuple = None, limit: int = None, stats: dict = None):
+    """A* toward goal when one is given, otherwise Dijkstra flood.
+    With a limit, only costs below it are kept and the search stops
+    once the frontier can no longer produce one.
+    Expanded node counts are added to stats["expanded"] when a stats dict is passed.
+    Returns (came_from, cost_so_far) keyed by flat index"""
+    width = graph.width
+    height = graph.height
+    walkable = graph.walkable_flat()
+    costs = graph.cost_flat()
+    min_cost = graph.min_cost() # Manhattan distance times this never overestimates
+
+    start_index = start[0] * height + start[1]
+    if goal is not None:
+        goal_x, goal_y = goal
+        goal_index = goal_x * height + goal_y
+        heuristic = (abs(start[0] - goal_x) + abs(start[1] - goal_y)) * min_cost
+    else:
+        goal_index = -1
+        heuristic = 0
 
-    cost_so_far = dict()
-    cost_so_far[start] = 0
+    came_from = {start_index: None}
+    cost_so_far = {start_index: 0}
+    closed = set()
 
-    while not frontier.empty():
-        current = frontier.get()[1]
+    sequence = 0
+    frontier = [(heuristic, heuristic, sequence, start_index)]
 
-        if current == goal:
+    while frontier:
+        current = heappop(frontier)[3]
+        if current in closed:
+            continue # Stale entry, already expanded at a lower cost
+        if current == goal_index:
             break
-
-        for next in graph.neighbors(current):
-            new_cost = cost_so_far[current] + graph.cost(current, next)
+        closed.add(current)
+
+        current_cost = cost_so_far[current]
+        if limit is not None and current_cost + min_cost >= limit:
+            break # Popped in cost order: nothing left on the frontier can stay in range
+
+        x, y = divmod(current, height)
+        # Same neighbor order as DIRECTIONS: north, south, west, east
+        for next, in_bounds in (
+            (current - 1, y > 0),
+            (current + 1, y < height - 1),
+            (current - height, x > 0),
+            (current + height, x < width - 1)):
+            if not in_bounds or not walkable[next] or next in closed:
+                continue
+            new_cost = current_cost + costs[next] # Same as graph.cost(current, next)
+            if limit is not None and new_cost >= limit:
+                continue
             if next not in cost_so_far or new_cost < cost_so_far[next]:
                 cost_so_far[next] = new_cost
-                priority = new_cost + grid_distance(next, goal)
-                frontier.put((priority, next))
                 came_from[next] = current
-
+                if goal_index >= 0:
+                    next_x, next_y = divmod(next, height)
+                    heuristic = (abs(next_x - goal_x) + abs(next_y - goal_y)) * min_cost
+                sequence += 1
+                heappush(frontier, (new_cost + heuristic, heuristic, sequence, next))
+
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + len(closed)
     return came_from, cost_so_far
 
-# Dijkstra's Rangefinding
-def range_find(start: tuple, range: int, graph: Grid):
-    start = Space(*start)
-
-    frontier = PriorityQueue()
-    frontier.put((0, start))
+def index_results_to_spaces(came_from: dict, cost_so_far: dict, height: int):
+    """Convert flat-index search results to the Space-keyed dicts callers use"""
+    spaces = {index: Space(*divmod(index, height)) for index in cost_so_far}
+    came_from = {spaces[index]: (None if parent is None else spaces[parent])
+        for index, parent in came_from.items()}
+    cost_so_far = {spaces[index]: cost for index, cost in cost_so_far.items()}
+    return came_from, cost_so_far
 
-    came_from = dict()
-    came_from[start] = None
+# A* Pathfinding 
+def path_find(start: tuple, goal: tuple, graph: Grid, stats: dict = None, jump_points: bool = None):
+    """Pathfinding graph algorithm. Uniform-cost boards use Jump Point Search once its scan tables
+    are built for the current board (see warm_jump_points): faster than heap A* per query, but
+    building the tables costs more than one A* query, so a board that changes between single
+    queries (as in play) stays on heap A*. jump_points=True always jumps on uniform-cost boards
+    (building the tables if needed), False never does"""
+    if jump_points is None:
+        jump_points = graph.horizontal_jumps_cache is not None
+    if jump_points and graph.uniform_cost():
+        # Uniform steps make most shortest paths symmetric: jump over them
+        came_from, cost_so_far = JumpPoint.jump_point_search(graph, start, goal, stats=stats)
+    else:
+        came_from, cost_so_far = heap_search(graph, start, goal=goal, stats=stats)
+    return index_results_to_spaces(came_from, cost_so_far, graph.height)
 
-    cost_so_far = dict()
-    cost_so_far[start] = 0
+def warm_jump_points(graph: Grid) -> bool:
+    """Build the jump tables ahead of a batch of path_find calls on an unchanging
+    uniform-cost board, so they use Jump Point Search. Returns whether it applies"""
+    if not graph.uniform_cost():
+        return False
+    graph.horizontal_jumps()
+    return True
 
-    while not frontier.empty():
-        current = frontier.get()[1]
-        # No goal/early exit
-        for next in graph.neighbors(current):
-            new_cost = cost_so_far[current] + graph.cost(current, next)
-            if new_cost < range and (next not in cost_so_far or new_cost < cost_so_far[next]):
-                cost_so_far[next] = new_cost
-                priority = new_cost
-                frontier.put((priority, next))
-                came_from[next] = current
-    return came_from, cost_so_far
+# Dijkstra's Rangefinding
+def range_find(start: tuple, range: int, graph: Grid, stats: dict = None):
+    came_from, cost_so_far = heap_search(graph, start, limit=range, stats=stats)
+    return index_results_to_spaces(came_from, cost_so_far, graph.height)
 
 def path_reconstruct(start: tuple, goal: tuple, search_result: dict) -> list:
     result_path = list()
@@ -131,6 +535,82 @@ def path_reconstruct(start: tuple, goal: tuple, search_result: dict) -> list:
     # result_path.reverse()
     return result_path
 
+def tree_path_find(start: tuple, goal: tuple, graph: Grid, range_tree: dict = None) -> list:
+    """Path (goal first, like path_reconstruct) from start to goal.
+    A range_find came_from dict rooted at start is already a shortest-path tree,
+    so goals inside it are walked back in O(path length); anything else falls back to A*"""
+    start = Space(*start)
+    goal = Space(*goal)
+    if range_tree is not None and goal in range_tree and range_tree.get(start, start) is None:
+        return path_reconstruct(start, goal, range_tree)
+
+    came_from, _ = path_find(start, goal, graph)
+    return path_reconstruct(start, goal, came_from)
+
+# ----- Batch Pathfinding -----
+WORKER_GRID = None # type: Grid # Per worker process, set once by the pool initializer
+PATH_POOL = None # type: ProcessPoolExecutor # Long-lived, see start_path_pool
+PATH_POOL_BOARD = None # (grid id, version, workers) the pool's snapshot was taken from
+PARALLEL_MIN_REQUESTS = 512 # Smaller batches finish sooner serially than the pool's IPC takes
+
+def init_path_worker(snapshot: Grid):
+    global WORKER_GRID
+    WORKER_GRID = snapshot
+    warm_jump_points(WORKER_GRID) # The snapshot never changes, every query reuses the tables
+
+def path_worker(requests: list) -> list:
+    return [path_find_one(start, goal, WORKER_GRID) for start, goal in requests]
+
+def path_find_one(start: tuple, goal: tuple, graph: Grid) -> list:
+    """Path (goal first, like path_reconstruct) or None when goal can't be reached"""
+    came_from, _ = path_find(start, goal, graph)
+    if Space(*goal) not in came_from:
+        return None
+    return path_reconstruct(start, goal, came_from)
+
+def start_path_pool(graph: Grid, workers: int) -> ProcessPoolExecutor:
+    """(Re)start the pool when the board differs from the snapshot the workers hold"""
+    global PATH_POOL, PATH_POOL_BOARD
+    board = (id(graph), graph.version, workers)
+    if PATH_POOL is not None and board == PATH_POOL_BOARD:
+        return PATH_POOL
+    close_path_pool()
+    PATH_POOL_BOARD = board
+    PATH_POOL = ProcessPoolExecutor(max_workers=workers,
+        initializer=init_path_worker,
+        initargs=(graph.snapshot(),))
+    return PATH_POOL
+
+def close_path_pool():
+    global PATH_POOL, PATH_POOL_BOARD
+    if PATH_POOL is not None:
+        PATH_POOL.shutdown()
+        PATH_POOL = None
+        PATH_POOL_BOARD = None
+
+def submit_path_find_many(requests, graph: Grid, workers: int, chunksize: int = 16) -> list:
+    """Queue (start, goal) queries on the path pool without waiting for them.
+    Returns futures in request order, each resolving to the paths of chunksize requests"""
+    requests = list(requests)
+    executor = start_path_pool(graph, workers)
+    return [executor.submit(path_worker, requests[index:index + chunksize])
+        for index in range(0, len(requests), chunksize)]
+
+def path_find_many(requests, graph: Grid, workers: int = None, chunksize: int = 16) -> list:
+    """Answer many (start, goal) queries against one board state, results in request order.
+    The batch warms the jump tables, so uniform-cost boards use Jump Point Search.
+    Serially the queries share the grid's flat search caches; with workers, batches of at least
+    PARALLEL_MIN_REQUESTS go to a long-lived pool that holds an actor-free snapshot of the board,
+    rebuilt only when graph.version changes"""
+    requests = list(requests)
+    if not workers or workers < 2 or len(requests) < PARALLEL_MIN_REQUESTS:
+        if len(requests) > 1:
+            warm_jump_points(graph)
+        return [path_find_one(start, goal, graph) for start, goal in requests]
+
+    futures = submit_path_find_many(requests, graph, workers, chunksize)
+    return [path for future in futures for path in future.result()]
+
 def grid_distance(a: Space, b: Space):
     # Manhattan distance, square grid
     return abs(a.x - b.x) + abs(a.y - b.y)
@@ -138,8 +618,8 @@ def grid_distance(a: Space, b: Space):
 # ----- Testing Area -----
 def test_hash():
     test_coordinates = (0, 0)
-    space_a = Space(test_coordinates)
-    space_b = Space(test_coordinates)
+    space_a = Space(*test_coordinates)
+    space_b = Space(*test_coordinates)
     if not hash(space_a) == hash(space_b):
         print("Hash equality NOT working")
     else:
@@ -147,7 +627,7 @@ def test_hash():
 
 def test_hash_to_non_named_tuple():
     test_coordinates = (1, 1)
-    test_grid_space = Space((1, 1))
+    test_grid_space = Space(1, 1)
     if not hash(test_coordinates) == hash(test_grid_space):
         print("CanNOT compare hashes from named/non-named tuples")
     else:
@@ -155,7 +635,7 @@ def test_hash_to_non_named_tuple():
 
 def test_compare_tuple_named_tuple():
     test_coordinates = (1, 1)
-    test_grid_space = Space((1, 1))
+    test_grid_space = Space(1, 1)
 
     if not test_coordinates == test_grid_space:
         print("CanNOT compare equality from named/non-named tuples")
@@ -165,17 +645,44 @@ def test_compare_tuple_named_tuple():
 def test_grid_dict_subclass():
     test_coordinates = (0, 0)
     grid = Grid(1, 1)
-    # grid.map[space_a] = 5
-    grid[test_coordinates] = 5
-    # space_c = Space(0, 0)
-    test_get = grid[test_coordinates]
-    if not test_get == 5:
-        print("Hashtable set/fetch NOT working")
+    grid[test_coordinates] = None, "Endzone"
+    test_get = grid[Space(*test_coordinates)]
+    if not (test_get == (None, "Endzone") and test_coordinates in grid and list(grid) == [test_coordinates]):
+        print("Grid set/fetch NOT working")
+    else:
+        print("Grid set and get by Space coordinates working")
+
+def test_zobrist_incremental():
+    grid = Grid(3, 3)
+    for x in range(3):
+        for y in range(3):
+            grid[x, y] = None, "Blank"
+    empty_key = grid.zobrist
+
+    class Token: # Stand-in actor
+        solid = True
+        carrying = None
+    carrier, ball = Token(), Token()
+    grid[0, 0] = ball, "Blank"
+    grid[1, 1] = carrier, "Mud"
+    before_pickup = grid.zobrist
+    grid[0, 0] = None, "Blank"
+    carrier.carrying = ball
+    grid[1, 1] = carrier, "Mud"
+    incremental = grid.zobrist
+    grid.rehash()
+    if not (incremental == grid.zobrist and incremental != before_pickup):
+        print("Zobrist key NOT kept up to date")
     else:
-        print("Hashtable set and get by Space coordinates working")
+        grid[1, 1] = None, "Blank"
+        if grid.zobrist != empty_key:
+            print("Zobrist key NOT restored after undoing changes")
+        else:
+            print("Zobrist key updated incrementally, carrying included")
 
 def test_all():
     test_hash()
+    test_zobrist_incremental()
     test_grid_dict_subclass()
     test_hash_to_non_named_tuple()
     test_compare_tuple_named_tuple()
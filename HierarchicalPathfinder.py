@@ -0,0 +1,390 @@
+from heapq import heappush, heappop
+
+from Grid import Grid, Space, heap_search, index_results_to_spaces, path_find
+
+# Entrance runs shorter than this get one transition in the middle, longer ones one at each end
+WIDE_ENTRANCE = 6
+
+class HierarchicalPathfinder:
+    """HPA* over a Grid split into cluster_size x cluster_size clusters.
+    Abstract nodes are the cells either side of each cluster-border entrance,
+    joined across borders (inter edges) and, inside each cluster, by their
+    cluster-confined shortest distances (intra edges). A query searches that
+    small graph and only refines the chosen abstract path into cells.
+    Paths are NOT guaranteed shortest: refinement only searches the clusters the
+    abstract path crosses, and entrances are sampled (one or two cells each), so
+    on cluttered maps a path can cost about twice the optimum (on open maps it
+    is usually within a few percent). Use Grid.path_find where exact costs matter.
+    Clusters touched by a grid change are rebuilt lazily on the next query.
+    Call close() when done with it, the grid otherwise keeps it alive."""
+    def __init__(self, grid: Grid, cluster_size: int = 16):
+        self.grid = grid
+        self.cluster_size = cluster_size
+
+        # Abstract graph, nodes are flat indices (x * height + y) like Grid.heap_search
+        self.borders = dict() # (cluster, cluster) -> [(node, node), ...] transitions
+        self.cluster_nodes = dict() # cluster -> set of nodes
+        self.intra_edges = dict() # cluster -> {node: {node: cost}}
+        self.inter_edges = dict() # node -> {node: cost} across borders
+
+        self.dirty_clusters = set()
+        self.rebuild_all = True
+
+        grid.subscribe(self.grid_changed)
+
+    def close(self):
+        self.grid.unsubscribe(self.grid_changed)
+        self.dirty_clusters.clear()
+        self.rebuild_all = True
+
+    # ----- Change Tracking -----
+    def grid_changed(self, space: Space, terrain_changed: bool):
+        if space is None:
+            self.rebuild_all = True
+        else:
+            self.dirty_clusters.add(self.cluster_of(*space))
+
+    def cluster_of(self, x: int, y: int) -> tuple:
+        return x // self.cluster_size, y // self.cluster_size
+
+    def cluster_bounds(self, cluster: tuple) -> tuple:
+        """(x0, y0, x1, y1), end exclusive"""
+        size = self.cluster_size
+        cx, cy = cluster
+        return (cx * size, cy * size,
+            min((cx + 1) * size, self.grid.width), min((cy + 1) * size, self.grid.height))
+
+    def cluster_count(self) -> tuple:
+        size = self.cluster_size
+        return -(-self.grid.width // size), -(-self.grid.height // size)
+
+    def cluster_borders(self, cluster: tuple) -> list:
+        """Border keys (lower cluster, higher cluster) around a cluster"""
+        columns, rows = self.cluster_count()
+        cx, cy = cluster
+        borders = list()
+        if cx > 0: borders.append(((cx - 1, cy), cluster))
+        if cx < columns - 1: borders.append((cluster, (cx + 1, cy)))
+        if cy > 0: borders.append(((cx, cy - 1), cluster))
+        if cy < rows - 1: borders.append((cluster, (cx, cy + 1)))
+        return borders
+
+    # ----- Abstract Graph Building -----
+    def refresh(self):
+        """Bring the abstract graph up to date with the grid"""
+        if self.rebuild_all:
+            self.build()
+        elif self.dirty_clusters:
+            self.rebuild_clusters(self.dirty_clusters)
+        self.dirty_clusters = set()
+
+    def build(self):
+        self.borders.clear()
+        self.cluster_nodes.clear()
+        self.intra_edges.clear()
+        self.inter_edges.clear()
+
+        columns, rows = self.cluster_count()
+        clusters = [(cx, cy) for cx in range(columns) for cy in range(rows)]
+        for cluster in clusters:
+            for border in self.cluster_borders(cluster):
+                if border not in self.borders:
+                    self.build_border(border)
+        for cluster in clusters:
+            self.build_cluster(cluster)
+        self.rebuild_all = False
+
+    def rebuild_clusters(self, clusters: set):
+        # A changed cluster moves the entrances on its borders, which changes
+        # the abstract nodes (and so the intra edges) of the clusters across them
+        affected = set(clusters)
+        borders = {border for cluster in clusters for border in self.cluster_borders(cluster)}
+        for border in borders:
+            self.build_border(border)
+            affected.update(border)
+        for cluster in affected:
+            self.build_cluster(cluster)
+
+    def build_border(self, border: tuple):
+        height = self.grid.height
+        walkable = self.grid.walkable_flat()
+        costs = self.grid.cost_flat()
+
+        # Drop the previous transitions on this border
+        for a, b in self.borders.get(border, ()):
+            for node, other in ((a, b), (b, a)):
+                links = self.inter_edges.get(node)
+                if links is not None:
+                    links.pop(other, None)
+                    if not links:
+                        del self.inter_edges[node]
+
+        low, high = border
+        x0, y0, x1, y1 = self.cluster_bounds(low)
+        if low[1] == high[1]: # Side by side: border runs down the low cluster's last column
+            pairs = [((x1 - 1) * height + y, x1 * height + y) for y in range(y0, y1)]
+        else: # Stacked: border runs along the low cluster's last row
+            pairs = [(x * height + y1 - 1, x * height + y1) for x in range(x0, x1)]
+
+        transitions = list()
+        run = list()
+        for pair in pairs + [None]: # Sentinel closes the last run
+            if pair is not None and walkable[pair[0]] and walkable[pair[1]]:
+                run.append(pair)
+                continue
+            if run:
+                if len(run) < WIDE_ENTRANCE:
+                    transitions.append(run[len(run) // 2])
+                else:
+                    transitions.append(run[0])
+                    transitions.append(run[-1])
+                run = list()
+
+        for a, b in transitions:
+            self.inter_edges.setdefault(a, dict())[b] = costs[b]
+            self.inter_edges.setdefault(b, dict())[a] = costs[a]
+        self.borders[border] = transitions
+
+    def build_cluster(self, cluster: tuple):
+        nodes = set()
+        for low, high in self.cluster_borders(cluster):
+            for a, b in self.borders.get((low, high), ()):
+                nodes.add(a if low == cluster else b)
+        self.cluster_nodes[cluster] = nodes
+
+        edges = dict()
+        bounds = self.cluster_bounds(cluster)
+        for node in nodes:
+            distances, _ = self.cluster_search(node, bounds)
+            edges[node] = {other: distances[other] for other in nodes
+                if other != node and other in distances}
+        self.intra_edges[cluster] = edges
+
+    # ----- Searching -----
+    def cluster_search(self, origin: int, bounds: tuple, goal: int = -1, reverse: bool = False):
+        """Dijkstra (stopping at goal if given) confined to a cluster's bounds.
+        reverse gives costs *to* origin rather than from it.
+        Returns (cost_so_far, came_from) keyed by flat index"""
+        height = self.grid.height
+        walkable = self.grid.walkable_flat()
+        costs = self.grid.cost_flat()
+        x0, y0, x1, y1 = bounds
+
+        came_from = {origin: None}
+        cost_so_far = {origin: 0}
+        closed = set()
+        sequence = 0
+        frontier = [(0, sequence, origin)]
+        while frontier:
+            current_cost, _, current = heappop(frontier)
+            if current in closed:
+                continue
+            if current == goal:
+                break
+            closed.add(current)
+
+            x, y = divmod(current, height)
+            # Reverse steps pay for the cell being left (entering it on the forward path)
+            step_cost = costs[current] if reverse else 0
+            for next, in_bounds in (
+                (current - 1, y > y0),
+                (current + 1, y < y1 - 1),
+                (current - height, x > x0),
+                (current + height, x < x1 - 1)):
+                if not in_bounds or not walkable[next] or next in closed:
+                    continue
+                new_cost = current_cost + (step_cost if reverse else costs[next])
+                if next not in cost_so_far or new_cost < cost_so_far[next]:
+                    cost_so_far[next] = new_cost
+                    came_from[next] = current
+                    sequence += 1
+                    heappush(frontier, (new_cost, sequence, next))
+        return cost_so_far, came_from
+
+    def path_find(self, start: tuple, goal: tuple):
+        """Drop-in for Grid.path_find: (came_from, cost_so_far) keyed by Space,
+        holding just the refined path. Not guaranteed shortest, see the class docstring"""
+        grid = self.grid
+        height = grid.height
+        start_cluster = self.cluster_of(*start)
+        goal_cluster = self.cluster_of(*goal)
+        if start_cluster == goal_cluster or \
+            abs(start[0] - goal[0]) + abs(start[1] - goal[1]) <= self.cluster_size:
+            # Short hop: a plain search is already cheap, and entrance detours would dominate it
+            came_from, cost_so_far = heap_search(grid, start, goal=goal)
+            return index_results_to_spaces(came_from, cost_so_far, height)
+
+        start_index = start[0] * height + start[1]
+        goal_index = goal[0] * height + goal[1]
+        if not grid.walkable_flat()[goal_index]:
+            # Hole or solid actor on the goal: unreachable, like Grid.path_find just without the flood
+            return index_results_to_spaces({start_index: None}, {start_index: 0}, height)
+
+        self.refresh()
+
+        # Temporarily hook start and goal into the abstract graph
+        start_costs, _ = self.cluster_search(start_index, self.cluster_bounds(start_cluster))
+        start_edges = {node: start_costs[node] for node in self.cluster_nodes[start_cluster]
+            if node in start_costs}
+        goal_costs, _ = self.cluster_search(goal_index, self.cluster_bounds(goal_cluster), reverse=True)
+        goal_edges = {node: goal_costs[node] for node in self.cluster_nodes[goal_cluster]
+            if node in goal_costs}
+
+        abstract_path = self.abstract_search(start_index, goal_index, start_edges, goal_edges)
+        refined = None
+        if abstract_path is not None:
+            refined = self.refine(abstract_path, start_index, goal_index)
+        if refined is None:
+            # Hierarchy found nothing (e.g. the only way out is through the start cell itself)
+            came_from, cost_so_far = heap_search(grid, start, goal=goal)
+            return index_results_to_spaces(came_from, cost_so_far, height)
+        return index_results_to_spaces(*refined, height)
+
+    def abstract_search(self, start: int, goal: int, start_edges: dict, goal_edges: dict) -> list:
+        height = self.grid.height
+        min_cost = self.grid.min_cost()
+        goal_x, goal_y = divmod(goal, height)
+
+        def heuristic(node):
+            x, y = divmod(node, height)
+            return (abs(x - goal_x) + abs(y - goal_y)) * min_cost
+
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+        closed = set()
+        sequence = 0
+        frontier = [(heuristic(start), sequence, start)]
+        while frontier:
+            current = heappop(frontier)[2]
+            if current in closed:
+                continue
+            if current == goal:
+                path = list()
+                while current is not None:
+                    path.append(current)
+                    current = came_from[current]
+                path.reverse()
+                return path
+            closed.add(current)
+
+            if current == start:
+                edges = start_edges.items()
+            else:
+                cluster = self.cluster_of(*divmod(current, height))
+                edges = list(self.intra_edges[cluster].get(current, dict()).items())
+                edges.extend(self.inter_edges.get(current, dict()).items())
+                if current in goal_edges:
+                    edges.append((goal, goal_edges[current]))
+
+            for next, edge_cost in edges:
+                if next in closed:
+                    continue
+                new_cost = cost_so_far[current] + edge_cost
+                if next not in cost_so_far or new_cost < cost_so_far[next]:
+                    cost_so_far[next] = new_cost
+                    came_from[next] = current
+                    sequence += 1
+                    heappush(frontier, (new_cost + heuristic(next), sequence, next))
+        return None
+
+    def refine(self, abstract_path: list, start: int, goal: int):
+        """Expand the abstract path into cell steps: (came_from, cost_so_far) along the path,
+        or None when the corridor doesn't reach the goal.
+        Rather than stitching together the entrance-to-entrance segments (which
+        zigzags through every entrance), A* runs over the corridor of clusters the
+        abstract path passes through, so the path is the shortest inside that corridor"""
+        height = self.grid.height
+        walkable = self.grid.walkable_flat()
+        costs = self.grid.cost_flat()
+        min_cost = self.grid.min_cost()
+        size = self.cluster_size
+        corridor = {self.cluster_of(*divmod(node, height)) for node in abstract_path}
+        goal_x, goal_y = divmod(goal, height)
+
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+        closed = set()
+        sequence = 0
+        frontier = [(0, sequence, start)]
+        while frontier:
+            current = heappop(frontier)[2]
+            if current in closed:
+                continue
+            if current == goal:
+                break
+            closed.add(current)
+
+            x, y = divmod(current, height)
+            for next, nx, ny in (
+                (current - 1, x, y - 1),
+                (current + 1, x, y + 1),
+                (current - height, x - 1, y),
+                (current + height, x + 1, y)):
+                if nx < 0 or ny < 0 or nx >= self.grid.width or ny >= height:
+                    continue
+                if not walkable[next] or next in closed or (nx // size, ny // size) not in corridor:
+                    continue
+                new_cost = cost_so_far[current] + costs[next]
+                if next not in cost_so_far or new_cost < cost_so_far[next]:
+                    cost_so_far[next] = new_cost
+                    came_from[next] = current
+                    sequence += 1
+                    heuristic = (abs(nx - goal_x) + abs(ny - goal_y)) * min_cost
+                    heappush(frontier, (new_cost + heuristic, sequence, next))
+
+        if goal not in came_from:
+            return None # Corridor cut off from the goal, the caller falls back to a full search
+
+        # Keep just the path, as the docstring of path_find promises
+        path_from = dict()
+        path_costs = dict()
+        current = goal
+        while current is not None:
+            path_from[current] = came_from[current]
+            path_costs[current] = cost_so_far[current]
+            current = came_from[current]
+        return path_from, path_costs
+
+# ----- Testing Area -----
+def test_grid(holes=(), size: int = 64) -> Grid:
+    grid = Grid(size, size)
+    for x in range(size):
+        for y in range(size):
+            if (x, y) not in holes:
+                grid[x, y] = None, "Grass"
+    return grid
+
+def test_matches_path_find():
+    grid = test_grid(holes={(x, 30) for x in range(8, 56)}) # Wall with a gap at each end
+    pathfinder = HierarchicalPathfinder(grid)
+    goal = Space(40, 60)
+    came_from, cost_so_far = pathfinder.path_find((40, 2), goal)
+    _, exact_costs = path_find((40, 2), goal, grid)
+    pathfinder.close()
+    if goal not in came_from or cost_so_far[goal] < exact_costs[goal]:
+        print("HPA* path NOT found around the wall")
+    else:
+        print("HPA* path found around the wall, {0} vs shortest {1}".format(cost_so_far[goal], exact_costs[goal]))
+
+def test_unreachable_goals():
+    grid = test_grid(holes={(50, 50)})
+    class Token: # Stand-in actor
+        solid = True
+        carrying = None
+    grid[60, 60] = Token(), "Grass"
+    pathfinder = HierarchicalPathfinder(grid)
+    results = [pathfinder.path_find((2, 2), goal) for goal in (Space(60, 60), Space(50, 50))]
+    exact = [path_find((2, 2), goal, grid) for goal in (Space(60, 60), Space(50, 50))]
+    pathfinder.close()
+    if any(goal in came_from for (came_from, _), goal in zip(results + exact, [Space(60, 60), Space(50, 50)] * 2)):
+        print("Blocked/hole goals NOT reported unreachable")
+    else:
+        print("Blocked and hole goals unreachable, like Grid.path_find")
+
+def test_all():
+    test_matches_path_find()
+    test_unreachable_goals()
+
+if __name__ == "__main__":
+    # Run Tests
+    test_all()
@@ -0,0 +1,170 @@
+from heapq import heappush, heappop
+
+import numpy as np
+
+# Jump Point Search for 4-connected boards with uniform step cost.
+# Straight runs are skipped ("jumped") until a cell with a forced neighbor, so
+# the open list only ever holds jump points instead of every cell on the way.
+# Scans run over Grid.walkable_padded (a one-cell blocked border) so the inner
+# loops need no bounds checks; results are handed back in the flat
+# (x * height + y) indices Grid.heap_search uses.
+# Horizontal scans are looked up, not walked: horizontal_jumps precomputes where each
+# one stops, so the sideways checks on every vertical step are O(1).
+
+def horizontal_jumps(padded: np.ndarray) -> tuple:
+    """Where a horizontal scan from each cell of a padded [x, y] walkable board stops:
+    (east_stop, west_stop, stop_forced) as flat lists. A stop is the first cell at or past
+    the start that is blocked or has a forced neighbor; stop_forced says it is a jump point"""
+    columns = padded.shape[0]
+    blocked_up = np.zeros_like(padded)
+    blocked_up[:, 1:] = ~padded[:, :-1]
+    blocked_down = np.zeros_like(padded)
+    blocked_down[:, :-1] = ~padded[:, 1:]
+    open_up = ~blocked_up
+    open_down = ~blocked_down
+    open_up[:, 0] = False
+    open_down[:, -1] = False
+
+    # Forced neighbor moving east: a side cell open here that was blocked one column back
+    behind_up = np.ones_like(padded)
+    behind_up[1:] = blocked_up[:-1]
+    behind_down = np.ones_like(padded)
+    behind_down[1:] = blocked_down[:-1]
+    forced_east = padded & ((open_up & behind_up) | (open_down & behind_down))
+    ahead_up = np.ones_like(padded)
+    ahead_up[:-1] = blocked_up[1:]
+    ahead_down = np.ones_like(padded)
+    ahead_down[:-1] = blocked_down[1:]
+    forced_west = padded & ((open_up & ahead_up) | (open_down & ahead_down))
+
+    column = np.arange(columns)[:, None]
+    stride = padded.shape[1]
+    rows = np.arange(stride)[None, :]
+    # Nearest stop at or after (east) / at or before (west) each column; the border always stops
+    east = np.minimum.accumulate(np.where(~padded | forced_east, column, columns)[::-1], axis=0)[::-1]
+    west = np.maximum.accumulate(np.where(~padded | forced_west, column, -1), axis=0)
+    east_stop = (np.minimum(east, columns - 1) * stride + rows).ravel()
+    west_stop = (np.maximum(west, 0) * stride + rows).ravel()
+    return east_stop.tolist(), west_stop.tolist(), padded.ravel().tolist()
+
+def jump_point_search(graph, start: tuple, goal: tuple, stats: dict = None):
+    """A* over jump points. Returns (came_from, cost_so_far) keyed by flat index,
+    with every cell of the found path filled in so path_reconstruct can walk it.
+    Expanded jump points are added to stats["expanded"] when a stats dict is passed"""
+    height = graph.height
+    stride = height + 2
+    walkable = graph.walkable_padded()
+    east_stop, west_stop, stop_forced = graph.horizontal_jumps()
+    step_cost = graph.min_cost() # Only used on uniform-cost boards: every step costs this
+
+    start_x, start_y = int(start[0]), int(start[1]) # NumPy coordinates would turn the sign tricks into bools
+    goal_x, goal_y = int(goal[0]), int(goal[1])
+    start_index = (start_x + 1) * stride + start_y + 1
+    goal_index = (goal_x + 1) * stride + goal_y + 1
+
+    goal_row = goal_index % stride if walkable[goal_index] else -1 # A blocked goal is never reached
+
+    def jump_horizontal(i, step):
+        # step is +/- stride (one column). The scan stops at a blocked cell or a forced neighbor
+        # (a side cell that was blocked one step back), unless it passes the goal first
+        stop = east_stop[i] if step > 0 else west_stop[i]
+        if i % stride == goal_row and (i <= goal_index <= stop if step > 0 else stop <= goal_index <= i):
+            return goal_index
+        return stop if stop_forced[stop] else -1
+
+    def jump_vertical(i, step):
+        # step is +/- 1 (one row)
+        while True:
+            if not walkable[i]:
+                return -1
+            if i == goal_index:
+                return i
+            if (walkable[i - stride] and not walkable[i - stride - step]) or \
+                (walkable[i + stride] and not walkable[i + stride - step]):
+                return i
+            # No diagonal moves, so vertical runs stop wherever a sideways jump finds something
+            if jump_horizontal(i + stride, stride) >= 0 or jump_horizontal(i - stride, -stride) >= 0:
+                return i
+            i += step
+
+    came_from = {start_index: None}
+    cost_so_far = {start_index: 0}
+    closed = set()
+
+    sequence = 0
+    heuristic = (abs(start_x - goal_x) + abs(start_y - goal_y)) * step_cost
+    frontier = [(heuristic, heuristic, sequence, start_index)]
+
+    while frontier:
+        current = heappop(frontier)[3]
+        if current in closed:
+            continue
+        if current == goal_index:
+            break
+        closed.add(current)
+
+        x, y = divmod(current, stride)
+        parent = came_from[current]
+        if parent is None:
+            steps = (-1, 1, -stride, stride) # DIRECTIONS order
+        else:
+            parent_x, parent_y = divmod(parent, stride)
+            # Pruned neighbors: keep going straight, or turn to either side
+            if x != parent_x:
+                steps = (-1, 1, stride if x > parent_x else -stride)
+            else:
+                steps = (-stride, stride, 1 if y > parent_y else -1)
+
+        for step in steps:
+            if step == stride or step == -stride:
+                next = jump_horizontal(current + step, step)
+            else:
+                next = jump_vertical(current + step, step)
+            if next < 0 or next in closed:
+                continue
+
+            next_x, next_y = divmod(next, stride)
+            new_cost = cost_so_far[current] + (abs(next_x - x) + abs(next_y - y)) * step_cost
+            if next not in cost_so_far or new_cost < cost_so_far[next]:
+                cost_so_far[next] = new_cost
+                came_from[next] = current
+                # Padded coordinates are offset by one on both axes
+                heuristic = (abs(next_x - 1 - goal_x) + abs(next_y - 1 - goal_y)) * step_cost
+                sequence += 1
+                heappush(frontier, (new_cost + heuristic, heuristic, sequence, next))
+
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + len(closed)
+    if goal_index in came_from:
+        fill_jumps(came_from, cost_so_far, goal_index, stride, step_cost)
+    return unpad_results(came_from, cost_so_far, stride, height)
+
+def fill_jumps(came_from: dict, cost_so_far: dict, goal_index: int, stride: int, step_cost: int = 1):
+    """Expand the straight segments between jump points on the goal's chain into single steps"""
+    current = goal_index
+    while came_from[current] is not None:
+        jump_from = came_from[current]
+        x, y = divmod(current, stride)
+        from_x, from_y = divmod(jump_from, stride)
+        step = ((x > from_x) - (x < from_x)) * stride + ((y > from_y) - (y < from_y))
+
+        cost = cost_so_far[current]
+        cell = current
+        while cell != jump_from:
+            previous = cell - step
+            came_from[cell] = previous
+            cost_so_far[cell] = cost
+            cost -= step_cost
+            cell = previous
+        current = jump_from
+
+def unpad_results(came_from: dict, cost_so_far: dict, stride: int, height: int):
+    def unpad(index):
+        x, y = divmod(index, stride)
+        return (x - 1) * height + y - 1
+
+    indices = {index: unpad(index) for index in cost_so_far}
+    came_from = {indices[index]: (None if parent is None else indices[parent])
+        for index, parent in came_from.items()}
+    cost_so_far = {indices[index]: cost for index, cost in cost_so_far.items()}
+    return came_from, cost_so_far
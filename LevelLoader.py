@@ -3,37 +3,39 @@ import logging
 
 import json
 import importlib
+from typing import TYPE_CHECKING
 
 # from dotmap import DotMap
 
-from Game import Game
-from Grid import Grid
-from objects import BaseObject
+from Grid import Grid, TERRAIN_COSTS
 from constants import ROOT_PATH
 
+if TYPE_CHECKING: # Annotations only, keeps map loading usable without pygame (Simulation)
+    from Game import Game
+    from objects import BaseObject
+
 LEVEL_DIRECTORY = os.path.join(ROOT_PATH, 'levels')
 MAP_DIRECTORY = os.path.join(ROOT_PATH, "maps")
         
-def load_level(level_id: int, into_game: Game):
-    #
-    level_file = os.path.join(LEVEL_DIRECTORY, str(level_id) + '.json')
-    with open(level_file) as f:
-        level = json.load(f)
+def level_file(level_id: int) -> dict:
+    path = os.path.join(LEVEL_DIRECTORY, str(level_id) + '.json')
+    with open(path) as f:
+        return json.load(f)
 
-    # Actually load the json object(level dictionary) into the game
-    for go in [build_object(go, into_game) for go in level["neutral_objects"]]:
-        # no = build_object(go, into_game)
-        into_game.neutral_objects.add(go)
+def level_objects(level_id: int):
+    """(team, object dictionary) for every object in the level file"""
+    level = level_file(level_id)
 
-    for go in [build_object(go, into_game) for go in level["player_objects"]]:
-        # no = build_object(go, into_game)
-        into_game.player_objects.add(go)
+    for team in ["neutral", "player", "cpu"]:
+        for go in level[team + "_objects"]:
+            yield team, go
 
-    for go in [build_object(go, into_game) for go in level["cpu_objects"]]:
-        # no = build_object(go, into_game)
-        into_game.cpu_objects.add(go)
+def load_level(level_id: int, into_game: "Game"):
+    # Actually load the json object(level dictionary) into the game
+    for team, go in level_objects(level_id):
+        build_object(go, into_game, team)
 
-def build_object(go: dict, into_game: Game) -> BaseObject:
+def build_object(go: dict, into_game: "Game", team: str = "neutral") -> "BaseObject":
     # 'go' comes in as dictionary object
     # Module and Class of game object is referenced in the json
     module = importlib.import_module(go.pop("object_module"))
@@ -49,11 +51,8 @@ def build_object(go: dict, into_game: Game) -> BaseObject:
     go["y"] = y
     new_object = class_(**go)
 
-    into_game.game_objects.add(new_object) # set uses 'add', list uses 'append'
-
     # terrain should be loaded by now
-    terrain = into_game.grid[column, row].terrain
-    into_game.grid[column, row] = new_object, terrain
+    into_game.spawn(new_object, team, (column, row)) # Also registers it for rendering
 
     logging.info(into_game.grid[column, row])
     return new_object
@@ -61,17 +60,34 @@ def build_object(go: dict, into_game: Game) -> BaseObject:
 def load_map(level_id: int, into_grid: Grid):
     map_file = os.path.join(MAP_DIRECTORY, str(level_id) + '.txt')
     with open(map_file) as f:
-        for y, map_line in enumerate(f):
-            clean_line = map_line.strip()
-            for x, map_tile in enumerate(clean_line):
-                insert_map_tile(map_tile, x, y, into_grid)
+        map_lines = [map_line.strip() for map_line in f]
+
+    # Size the grid arrays once up front rather than growing per row
+    into_grid.reserve(max((len(line) for line in map_lines), default=0), len(map_lines))
+    into_grid.set_terrain_costs(level_terrain_costs(level_id))
+    for y, clean_line in enumerate(map_lines):
+        for x, map_tile in enumerate(clean_line):
+            insert_map_tile(map_tile, x, y, into_grid)
+
+def level_terrain_costs(level_id: int) -> dict:
+    """Entry cost per terrain for the level: Grid.TERRAIN_COSTS, overridden by the level
+    file's optional "terrain_costs" ({"Mud": 4, ...}). Levels without a file use the defaults"""
+    costs = dict(TERRAIN_COSTS)
+    if os.path.exists(os.path.join(LEVEL_DIRECTORY, str(level_id) + '.json')):
+        costs.update(level_file(level_id).get("terrain_costs", dict()))
+    return costs
+
+# Map file glyph -> terrain (movement costs per terrain: see level_terrain_costs)
+MAP_TILES = {
+    'T': "Endzone",
+    '_': "Blank",
+    'G': "Grass",
+    'M': "Mud"
+}
 
 def insert_map_tile(tile: chr, x: int, y: int, into_grid: Grid):
-    if tile == 'T':
-        terrain = "Endzone"
-    elif tile == '_':
-        terrain = "Blank"
-    else: # Skip invalid tiles for arbitrary shapes
+    terrain = MAP_TILES.get(tile)
+    if terrain is None: # Skip invalid tiles for arbitrary shapes
         return
 
     into_grid[x, y] = None, terrain
\ No newline at end of file
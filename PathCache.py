@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+from Grid import Grid, range_find
+
+class PathCache:
+    """LRU cache of range_find results for one Grid (player movement ranges;
+    paths to goals inside a range are walked back from its tree, see tree_path_find).
+    Entries are keyed on (query, start, range, grid version), so any
+    terrain/occupancy change on the grid makes older results unreachable.
+    Cached dictionaries are shared between callers and must not be mutated."""
+    def __init__(self, grid: Grid, max_entries: int = 256):
+        self.grid = grid
+        self.max_entries = max_entries
+
+        self.entries = OrderedDict()
+        self.version = grid.version
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: tuple, search):
+        if self.version != self.grid.version:
+            # Board changed: every stored result is stale, drop them all at once
+            self.entries.clear()
+            self.version = self.grid.version
+
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        result = search()
+        self.entries[key] = result
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False) # Least recently used
+        return result
+
+    def range_find(self, start: tuple, range: int):
+        key = ("range", tuple(start), range, self.grid.version)
+        return self.lookup(key, lambda: range_find(start, range, self.grid))
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -1,5 +1,6 @@
 import logging
-from renderers import ShapeRenderer
+from renderers import clear_sprite_cache
+from TextCache import TEXT_CACHE, get_font
 
 import pygame
 import pygame.draw
@@ -8,8 +9,11 @@ import pygame.font
 from pygame import Rect
 
 from Game import Game
-from objects import Renderable
+from Grid import Grid
+from Camera import Camera
+from FrameProfiler import FrameProfiler
 
+COLOR_BLACK = (0, 0, 0)
 COLOR_WHITE = (255, 255, 255)
 COLOR_DARK_GRAY = (25, 25, 25)
 COLOR_GRAY = (100, 100, 100)
@@ -18,9 +22,21 @@ COLOR_DARK_GREEN = (0, 50, 0)
 COLOR_LIGHT_GREEN = (0, 200, 0)
 COLOR_DARK_YELLOW = (50, 50, 0)
 COLOR_RED = (200, 0, 0)
+COLOR_GRASS = (20, 45, 20)
+COLOR_MUD = (45, 30, 15)
+
+# Background fill per terrain (anything unlisted draws as blank field)
+TERRAIN_COLORS = {
+    "Endzone": COLOR_DARK_GREEN,
+    "Grass": COLOR_GRASS,
+    "Mud": COLOR_MUD
+}
 
 DISPLAY_SURFACE = None # type: pygame.Surface
-BACKGROUND_SURFACE = None # type: pygame.Surface
+BACKGROUND = None # type: BackgroundChunks
+
+CHUNK_CELLS = 8 # Background chunk edge, in spaces
+CHUNK_EVICT_MARGIN = 2 # Chunks kept around outside the view
 
 HUD_FONT = None # type: pygame.font.Font
 MENU_FONT = None # type: pygame.font.Font
@@ -29,49 +45,183 @@ def register_display_surface(surface: pygame.Surface):
     global DISPLAY_SURFACE, HUD_FONT, MENU_FONT
     DISPLAY_SURFACE = surface
 
-    HUD_FONT = pygame.font.Font(None, 16) # Can't instantiate font before initialized
-    MENU_FONT = pygame.font.Font(None, 32)
-
-def setup_background_board(surface: pygame.Surface, game: Game):
-    global BACKGROUND_SURFACE
-    BACKGROUND_SURFACE = surface
-
-    # # Game Board Draw
-    # surface.fill(COLOR_DARK_GRAY)
-
-    # Grid Line & Terrain Draw (Full tile draw)
-    for tile in game.grid: # tile: Space
-        # pixel_x = tile.x * game.cell_size
-        # pixel_y = tile.y * game.cell_size
-        x, y = game.space_to_point(*tile)
-        # Draw grid lines
-        pygame.draw.lines(surface,
-            COLOR_RED,
-            True,
-            [
-                (x, y),
-                (x + game.cell_size, y),
-                (x + game.cell_size, y + game.cell_size),
-                (x, y + game.cell_size)
-            ]
-        )
-
-        terrain = game.grid[tile].terrain
-        terrain_color = COLOR_DARK_GRAY
-        if terrain == "Endzone":
-            # Draw something different for the endzone
-            terrain_color = COLOR_DARK_GREEN
-
-        pygame.draw.rect(surface,
-            terrain_color,
-            Rect(x + 1, y + 1,
-                game.cell_size - 1, game.cell_size - 1),
-            0 # Fill the square
-        )
+    HUD_FONT = get_font(16) # Can't instantiate font before initialized
+    MENU_FONT = get_font(32)
+
+def setup_background_board(game: Game):
+    global BACKGROUND
+    if BACKGROUND is not None:
+        BACKGROUND.close() # Stop following the previous game's grid
+    BACKGROUND = BackgroundChunks(game.grid)
+    clear_sprite_cache() # Cell size may have changed
+
+def draw_tile(surface: pygame.Surface, terrain: str, x: int, y: int, cell_size: int):
+    # Draw grid lines
+    pygame.draw.lines(surface,
+        COLOR_RED,
+        True,
+        [
+            (x, y),
+            (x + cell_size, y),
+            (x + cell_size, y + cell_size),
+            (x, y + cell_size)
+        ]
+    )
+
+    terrain_color = TERRAIN_COLORS.get(terrain, COLOR_DARK_GRAY)
+
+    pygame.draw.rect(surface,
+        terrain_color,
+        Rect(x + 1, y + 1,
+            cell_size - 1, cell_size - 1),
+        0 # Fill the square
+    )
+
+class BackgroundChunks:
+    """Board background (grid lines & terrain) as CHUNK_CELLS square surfaces,
+    rasterized the first time they come into view and dropped once they are
+    more than CHUNK_EVICT_MARGIN chunks outside it (or the zoom changes).
+    Terrain changes on the grid re-rasterize just the changed space in the cached chunks"""
+    def __init__(self, grid: Grid):
+        self.grid = grid
+        self.chunks = dict() # (chunk column, chunk row) -> Surface
+        self.cell_size = None # View cell size the chunks were drawn at
+        grid.subscribe(self.grid_changed)
+
+    def close(self):
+        self.grid.unsubscribe(self.grid_changed)
+        self.chunks.clear()
+
+    def grid_changed(self, space, terrain_changed: bool):
+        if not terrain_changed:
+            return # Actors only, the background doesn't show them
+        if space is None:
+            self.chunks.clear() # Whole board (reload, resize): redraw lazily
+        else:
+            self.redraw_space(*space)
+
+    def redraw_space(self, column: int, row: int):
+        """Re-rasterize one space's fill and surrounding grid lines in whichever cached chunks hold them"""
+        if self.cell_size is None:
+            return
+        cell_size = self.cell_size
+        span = CHUNK_CELLS * cell_size
+        # Plus one for the grid line hangover, shared with the neighbors
+        area = Rect(column * cell_size, row * cell_size, cell_size + 1, cell_size + 1)
+        for chunk_x in range(area.left // span, (area.right - 1) // span + 1):
+            for chunk_y in range(area.top // span, (area.bottom - 1) // span + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is None:
+                    continue # Not cached, drawn fresh when it comes into view
+                chunk.set_clip(area.move(-chunk_x * span, -chunk_y * span))
+                chunk.fill(COLOR_BLACK)
+                # Neighbors too: their grid lines border this space
+                self.draw_tiles(chunk, chunk_x, chunk_y, range(column - 1, column + 2), range(row - 1, row + 2))
+                chunk.set_clip(None)
+
+    def draw(self, surface: pygame.Surface, camera: Camera):
+        """Blit the chunks overlapping the surface clip"""
+        if camera.view_cell_size != self.cell_size:
+            self.chunks.clear()
+            self.cell_size = camera.view_cell_size
+        span = CHUNK_CELLS * self.cell_size
+
+        area = surface.get_clip()
+        first_x, first_y, last_x, last_y = self.chunk_range(camera, area)
+        for chunk_x in range(first_x, last_x + 1):
+            for chunk_y in range(first_y, last_y + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is None:
+                    chunk = self.render(chunk_x, chunk_y)
+                    self.chunks[chunk_x, chunk_y] = chunk
+                surface.blit(chunk, (chunk_x * span - camera.offset_x, chunk_y * span - camera.offset_y))
+
+        self.evict(camera)
+
+    def chunk_range(self, camera: Camera, area: Rect) -> tuple:
+        """Inclusive (first x, first y, last x, last y) chunks under a view area"""
+        span = CHUNK_CELLS * self.cell_size
+        chunks_x = max(1, -(-self.grid.width // CHUNK_CELLS))
+        chunks_y = max(1, -(-self.grid.height // CHUNK_CELLS))
+        return (max(0, (camera.offset_x + area.left) // span),
+            max(0, (camera.offset_y + area.top) // span),
+            min(chunks_x - 1, (camera.offset_x + area.right - 1) // span),
+            min(chunks_y - 1, (camera.offset_y + area.bottom - 1) // span))
+
+    def evict(self, camera: Camera):
+        first_x, first_y, last_x, last_y = self.chunk_range(camera, camera.view_rect)
+        for chunk_x, chunk_y in list(self.chunks):
+            if not (first_x - CHUNK_EVICT_MARGIN <= chunk_x <= last_x + CHUNK_EVICT_MARGIN
+                    and first_y - CHUNK_EVICT_MARGIN <= chunk_y <= last_y + CHUNK_EVICT_MARGIN):
+                del self.chunks[chunk_x, chunk_y]
+
+    def render(self, chunk_x: int, chunk_y: int) -> pygame.Surface:
+        cell_size = self.cell_size
+        span = CHUNK_CELLS * cell_size
+        chunk = pygame.Surface((span + 1, span + 1)) # Plus one for the grid line hangover
+        if pygame.display.get_surface() is not None:
+            chunk = chunk.convert()
+
+        # One extra ring of tiles: their grid lines land on this chunk's edges
+        column_0, row_0 = chunk_x * CHUNK_CELLS, chunk_y * CHUNK_CELLS
+        self.draw_tiles(chunk, chunk_x, chunk_y,
+            range(column_0 - 1, column_0 + CHUNK_CELLS + 1), range(row_0 - 1, row_0 + CHUNK_CELLS + 1))
+        return chunk
+
+    def draw_tiles(self, chunk: pygame.Surface, chunk_x: int, chunk_y: int, columns: range, rows: range):
+        column_0, row_0 = chunk_x * CHUNK_CELLS, chunk_y * CHUNK_CELLS
+        for column in columns:
+            for row in rows:
+                if (column, row) in self.grid: # Off the board or no terrain: left black
+                    draw_tile(chunk, self.grid[column, row].terrain,
+                        (column - column_0) * self.cell_size, (row - row_0) * self.cell_size, self.cell_size)
 
 def draw_debug(debug_message: str):
     pygame.display.set_caption(debug_message)
 
+# Frame graph: one stacked bar per frame, a color per phase
+PHASE_COLORS = {
+    "events": (200, 200, 0),
+    "update": (0, 150, 255),
+    "draw_game_board": (0, 200, 0),
+    "draw_game": (0, 120, 0),
+    "draw_hud": (200, 100, 0),
+    "draw_menu": (200, 0, 200),
+    "flip": (200, 0, 0),
+    "idle": (60, 60, 60)
+}
+GRAPH_SIZE = (240, 60) # px
+GRAPH_SCALE = 1.5 # Graph height in frame budgets
+
+def draw_frame_graph(profiler: FrameProfiler, game: Game) -> Rect:
+    """Frame time graph over the right end of the HUD, with the frame budget as a white line.
+    Returns the display rect drawn"""
+    graph = Rect((0, 0), GRAPH_SIZE)
+    graph.bottomright = (game.hud.right - 10, game.hud.bottom - 10)
+    pygame.draw.rect(DISPLAY_SURFACE, COLOR_BLACK, graph)
+
+    budget = profiler.budget_ms or 1000 / 30
+    px_per_ms = graph.height / (budget * GRAPH_SCALE)
+    frames = list(profiler.frames)[-graph.width:]
+    for i, frame in enumerate(frames):
+        x = graph.right - len(frames) + i
+        y = graph.bottom
+        for phase, ms in profiler.phase_times(frame).items():
+            height = ms * px_per_ms
+            top = max(graph.top, y - height)
+            if y - top >= 1:
+                pygame.draw.line(DISPLAY_SURFACE, PHASE_COLORS.get(phase, COLOR_WHITE), (x, y - 1), (x, top))
+            y -= height
+            if y <= graph.top:
+                break
+
+    budget_y = graph.bottom - round(budget * px_per_ms)
+    pygame.draw.line(DISPLAY_SURFACE, COLOR_WHITE, (graph.left, budget_y), (graph.right - 1, budget_y))
+    if frames:
+        draw_text(DISPLAY_SURFACE, f"{profiler.busy_ms(frames[-1]):.1f} ms",
+            graph.left + 2, graph.top + 2, HUD_FONT)
+    return graph
+
 def draw_game(surface: pygame.Surface, game: Game):
     # Game board Border draw
     border_width = 5
@@ -90,66 +240,131 @@ def draw_game(surface: pygame.Surface, game: Game):
     # draw_game_board(RENDER_SURFACES)
     # Game to Screen
     DISPLAY_SURFACE.blit(surface, game.game_area)
-    # TODO: Use 'update' for targeted draw, performance
-    # pygame.display.update(self.game_window)            
 
-def draw_game_board(surface: pygame.Surface, game: Game):
-    # Blit from board copy
-    surface.blit(BACKGROUND_SURFACE, (0, 0))
+def present_board_areas(surface: pygame.Surface, game: Game, rects: list) -> list:
+    """Copy only the given view rects from the game surface to the display.
+    Returns the display rects to pass to pygame.display.update"""
+    board_bounds = Rect(0, 0, game.board.width, game.board.height)
+    # Board position inside the game surface
+    offset = (game.board.x - game.game_area.x, game.board.y - game.game_area.y)
+
+    display_rects = list()
+    for rect in rects:
+        rect = rect.clip(board_bounds)
+        if rect.width and rect.height:
+            destination = rect.move(game.board.topleft)
+            DISPLAY_SURFACE.blit(surface, destination, rect.move(offset))
+            display_rects.append(destination)
+    return display_rects
+
+def draw_game_board(surface: pygame.Surface, game: Game, clip: Rect = None, alpha: float = 1.0):
+    # Only pixels inside clip (board-relative) are touched; None draws the whole board
+    # Objects are drawn alpha of the way through the current simulation tick
+    surface.set_clip(clip)
+
+    camera = game.camera
+    cell_size = camera.view_cell_size
+    offset = (camera.offset_x, camera.offset_y)
+
+    # Background chunks in view (off the board stays black)
+    surface.fill(COLOR_BLACK)
+    BACKGROUND.draw(surface, camera)
         
     # Selcted movement range fill
-    if game.selected_range is not None:
-        for space in game.selected_range:
-            # logging.info("range space: {0}".format(space))
-            x, y = game.space_to_point(*space)
-            pygame.draw.rect(surface,
-                COLOR_DARK_YELLOW,
-                Rect(x + 1, y + 1,
-                    game.cell_size - 1, game.cell_size - 1),
-                0 # Fill the square
-            )
+    RANGE_LAYER.blit(surface, game.selected_range, cell_size, offset)
 
     # Grid Selected Fill
     if game.selected_object is not None:
         # column = game.selected_object.x // game.cell_size
         # row = game.selected_object.y // game.cell_size
         column, row = game.point_to_space(*game.selected_object.topleft)
-
-        pygame.draw.rect(surface,
-            COLOR_LIGHT_GRAY,
-            Rect((column * game.cell_size) + 1, (row * game.cell_size) + 1,
-                game.cell_size - 1, game.cell_size - 1),
-            0 # Fill the square
-        )
+        x, y = camera.space_to_view(column, row)
+        surface.blit(cell_fill_surface(cell_size - 1, COLOR_LIGHT_GRAY), (x + 1, y + 1))
 
     # Projected Path Draw
-    if game.selected_path is not None:
-        draw_selected_path(surface, game.selected_path, game.cell_size)
+    PATH_LAYER.blit(surface, game.selected_path, cell_size, offset)
 
     # Mouse Hover Fill
     if game.cursor_in_grid:
         # mouse_column = game.game_cursor_x // game.cell_size
         # mouse_row = game.game_cursor_y // game.cell_size
         mouse = game.point_to_space(game.game_cursor_x, game.game_cursor_y)
-        pixel = game.space_to_point(*mouse)
-
-        cell_surface = pygame.Surface((game.cell_size, game.cell_size))
-        cell_surface.set_alpha(128) # Half transparancy
-        cell_surface.fill(COLOR_LIGHT_GRAY)
-        surface.blit(cell_surface, pixel)
-
-    # Game Object rendering
-    # for go in game.game_objects:
-    for go in {s for s in game.game_objects if isinstance(s, Renderable)}:
-        if go.renderer is None:
-            # TODO: Switch/case renderer registration
-            object_color = COLOR_WHITE
-            if go in game.player_objects: object_color = COLOR_LIGHT_GREEN
-            elif go in game.cpu_objects: object_color = COLOR_RED
-            go.renderer = ShapeRenderer(object_color, go.shape)
-        go.draw(surface)
-
-def draw_selected_path(surface: pygame.Surface, path: list, cell_size: int):
+        pixel = camera.space_to_view(*mouse)
+        surface.blit(cell_fill_surface(cell_size, COLOR_LIGHT_GRAY, 128), pixel) # Half transparancy
+
+    # Game Object rendering, layered, batched and culled to the view (see Game.spawn)
+    game.render_list.draw(surface, camera, alpha)
+
+    surface.set_clip(None)
+
+# ----- Overlay Layers -----
+class OverlayLayer:
+    """Board overlay over a collection of spaces (range, path), rasterized once into an
+    alpha surface covering just their bounding box and re-used while the source is unchanged.
+    Sources mutated in place (the path is popped while moving) are caught by their length"""
+    def __init__(self, draw):
+        self.draw = draw # draw(surface, spaces, cell_size, origin)
+        self.source = None
+        self.source_length = 0
+        self.cell_size = None
+        self.surface = None # type: pygame.Surface
+        self.origin = (0, 0)
+
+    def blit(self, surface: pygame.Surface, spaces, cell_size: int, offset: tuple = (0, 0)):
+        """Draw the overlay with the board scrolled by offset (view pixels)"""
+        if not spaces:
+            return
+        if spaces is not self.source or len(spaces) != self.source_length or cell_size != self.cell_size:
+            self.render(spaces, cell_size)
+        surface.blit(self.surface, (self.origin[0] - offset[0], self.origin[1] - offset[1]))
+
+    def render(self, spaces, cell_size: int):
+        columns = [space[0] for space in spaces]
+        rows = [space[1] for space in spaces]
+        left, top = min(columns), min(rows)
+        self.origin = (left * cell_size, top * cell_size)
+
+        # Plus one for the grid line hangover, like the board itself
+        size = ((max(columns) - left + 1) * cell_size + 1, (max(rows) - top + 1) * cell_size + 1)
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.draw(self.surface, spaces, cell_size, self.origin)
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert_alpha()
+
+        self.source = spaces
+        self.source_length = len(spaces)
+        self.cell_size = cell_size
+
+def draw_range_overlay(surface: pygame.Surface, spaces, cell_size: int, origin: tuple):
+    for column, row in spaces:
+        x = column * cell_size - origin[0]
+        y = row * cell_size - origin[1]
+        pygame.draw.rect(surface,
+            COLOR_DARK_YELLOW,
+            Rect(x + 1, y + 1,
+                cell_size - 1, cell_size - 1),
+            0 # Fill the square
+        )
+
+RANGE_LAYER = OverlayLayer(draw_range_overlay)
+PATH_LAYER = OverlayLayer(lambda surface, path, cell_size, origin:
+    draw_selected_path(surface, path, cell_size, origin))
+
+# Solid (or uniformly translucent) square cell fills, keyed by (size, color, alpha)
+CELL_SURFACES = dict()
+
+def cell_fill_surface(size: int, color, alpha: int = None) -> pygame.Surface:
+    key = (size, color, alpha)
+    cell_surface = CELL_SURFACES.get(key)
+    if cell_surface is None:
+        cell_surface = pygame.Surface((size, size))
+        if alpha is not None:
+            cell_surface.set_alpha(alpha)
+        cell_surface.fill(color)
+        CELL_SURFACES[key] = cell_surface
+    return cell_surface
+
+def draw_selected_path(surface: pygame.Surface, path: list, cell_size: int, origin: tuple = (0, 0)):
     # path.reverse()
     if len(path) > 1:
         # Loop and draw squares based on where it came from and where it is going
@@ -159,11 +374,12 @@ def draw_selected_path(surface: pygame.Surface, path: list, cell_size: int):
             if i > 0: following = path[i-1]
             previous = None
             if i < (len(path)-1): previous = path[i+1]
-            draw_path_space(surface, current, previous, following, cell_size)
+            draw_path_space(surface, current, previous, following, cell_size, origin)
 
-def draw_path_space(surface: pygame.Surface, current, previous, following, cell_size: int):
+def draw_path_space(surface: pygame.Surface, current, previous, following, cell_size: int, origin: tuple = (0, 0)):
     # Draw in two halves, based on where we're coming from, and where we're going
-    current_center = ((current.x * cell_size) + (cell_size // 2), (current.y * cell_size) + (cell_size // 2))
+    current_center = ((current.x * cell_size) + (cell_size // 2) - origin[0],
+        (current.y * cell_size) + (cell_size // 2) - origin[1])
     if previous is not None:
         # Draw half from previous space to current center
         previous_diff = (current.x - previous.x, current.y - previous.y)
@@ -225,32 +441,10 @@ def draw_menu(surface: pygame.Surface, game: Game):
     # pygame.display.update(game.menu)
 
 def draw_text(surface: pygame.Surface, string: str, x: int, y: int, font: pygame.font.Font):
-    text_surface = font.render(string, False, COLOR_WHITE)
+    text_surface = TEXT_CACHE.render(font, string, COLOR_WHITE)
     surface.blit(text_surface, (x, y))
 
 def draw_centered_text(surface: pygame.Surface, string: str, x: int, y: int, font: pygame.font.Font):
-    text_surface = font.render(string, False, COLOR_WHITE)
+    text_surface = TEXT_CACHE.render(font, string, COLOR_WHITE)
     text_rect = text_surface.get_rect(center=(x,y))
     surface.blit(text_surface, text_rect)
-
-# TODO: Move Text Texture drawing to ObjectRenderer type
-# def draw_text_texture(surface: pygame.Surface, go: BaseObject, cell_size: int):
-#     # Fetch the text texture of the object
-#     texture = go.text_texture
-#     # Split texture into array of string
-#     texture_lines = [row for row in (raw.strip() for raw in texture.splitlines()) if row]
-#     # Count number of rows for texture height
-#     texture_height = cell_size // len(texture_lines)
-#     # Calculate texture width based on relative height size, based on first row
-#     # texture_width = cell_size // len(texture_lines[0])
-
-#     texture_font = pygame.font.Font(None, texture_height)
-    
-#     for i_row, t_row in enumerate(texture_lines):
-#         draw_centered_text(
-#             surface,
-#             t_row,
-#             go.x + (cell_size // 2),
-#             go.y + (cell_size // 2) + (texture_height * i_row),
-#             texture_font
-#         )
@@ -0,0 +1,230 @@
+# Simulation.py
+"""Display-free game core: the board, who stands where, the move rules and whose turn it is.
+No pygame, no event queue, no windows, so it can run turns headless (AI search, regression runs).
+Game wraps one for the UI and animates what it reports."""
+import time
+import random
+import logging
+
+from Grid import Grid, Space, range_find, zobrist_key, ZOBRIST_TURN
+import LevelLoader
+from constants import PLAYER_IDLE, ENEMY_TURN
+
+PLAYER = "player"
+CPU = "cpu"
+NEUTRAL = "neutral"
+
+# Whose pieces move in each turn state; END_TURN (StateMachine.TRANSITIONS) flips between them
+TURN_TEAMS = {PLAYER_IDLE: PLAYER, ENEMY_TURN: CPU}
+NEXT_TURN = {PLAYER_IDLE: ENEMY_TURN, ENEMY_TURN: PLAYER_IDLE}
+
+# Zobrist keys for the state kept outside the grid (see Simulation.key)
+TURN_KEYS = {turn_state: zobrist_key(ZOBRIST_TURN, 0, 0, code) for code, turn_state in enumerate(TURN_TEAMS)}
+WINNER_KEYS = {team: zobrist_key(ZOBRIST_TURN, 1, 0, code) for code, team in enumerate([PLAYER, CPU, NEUTRAL])}
+
+# Outcomes of a move, reported back for the UI to show
+PICKUP = "pickup" # (PICKUP, carrier, ball)
+BOUNCE = "bounce" # (BOUNCE, ball, space)
+VICTORY = "victory" # (VICTORY, team)
+
+class Piece:
+    """Display-free actor, with the same rule attributes as objects.BaseObject"""
+    def __init__(self, name: str, can_carry: bool = False, is_ball: bool = False,
+            solid: bool = True, selectable: bool = True, movement_range: int = 5):
+        self.name = name
+        self.can_carry = can_carry
+        self.is_ball = is_ball
+        self.solid = solid
+        self.selectable = selectable
+        self.movement_range = movement_range
+        self.carrying = None
+
+    def __repr__(self):
+        return f"Piece({self.name})"
+
+# Level JSON object_class -> Piece arguments
+PIECE_CLASSES = {
+    "Carrier": {"can_carry": True},
+    "Blocker": {},
+    "Ball": {"is_ball": True, "solid": False, "selectable": False}
+}
+
+def build_piece(go: dict) -> Piece:
+    """Piece for a level JSON object (see LevelLoader.build_object)"""
+    arguments = dict(PIECE_CLASSES.get(go["object_class"], {}))
+    return Piece(go.get("name", go["object_class"]), **arguments)
+
+class Simulation:
+    """Board state and rules. Actors are anything with the Piece attributes
+    (Pieces headless, objects.BaseObject under Game)"""
+    def __init__(self, grid: Grid = None, seed: int = None):
+        self.grid = grid if grid is not None else Grid()
+        self.random = random.Random(seed)
+
+        self.positions = dict() # actor -> Space, carried balls ride with their carrier
+        self.teams = dict() # actor -> team
+
+        self.turn_state = PLAYER_IDLE
+        self.turn_number = 1
+        self.winner = None # Team, once the game is over
+
+    @property
+    def team_to_move(self) -> str:
+        return TURN_TEAMS[self.turn_state]
+
+    @property
+    def game_over(self) -> bool:
+        return self.winner is not None
+
+    # Actors
+    def add(self, actor, team: str, space: tuple):
+        space = Space(*space)
+        self.teams[actor] = team
+        self.positions[actor] = space
+        self.grid[space] = actor, self.grid[space].terrain
+
+    def remove(self, actor):
+        space = self.positions.pop(actor, None)
+        self.teams.pop(actor, None)
+        if space is not None and space in self.grid and self.grid[space].actor is actor:
+            self.grid[space] = None, self.grid[space].terrain
+        self.grid.release_actor(actor)
+
+    def pieces(self, team: str) -> list:
+        return [actor for actor, actor_team in self.teams.items() if actor_team == team]
+
+    # Rules
+    def legal_goals(self, actor) -> list:
+        """Spaces the actor may move to: within movement range, not onto anything solid"""
+        start = self.positions[actor]
+        reachable = range_find(start, actor.movement_range, self.grid)[1]
+        # The search only enters passable spaces, so only the start can hold something solid
+        if self.grid.solid[start]:
+            return [space for space in reachable if space != start]
+        return list(reachable)
+
+    def leave(self, actor):
+        """Lift the actor off its space (start of a move)"""
+        space = self.positions[actor]
+        if self.grid[space].actor is actor:
+            self.grid[space] = None, self.grid[space].terrain
+
+    def arrive(self, actor, goal: tuple) -> list:
+        """Set the actor down on goal and resolve what it finds there.
+        Returns the outcomes [(PICKUP, actor, ball), (BOUNCE, ball, space), (VICTORY, team)]"""
+        goal = Space(*goal)
+        outcomes = list()
+        target, terrain = self.grid[goal]
+        # TODO: Need to build priority Dict for switch/case on target and terrain
+        # Priority 1: Game Enders
+        if terrain == "Endzone" and actor.carrying is not None and actor.carrying.is_ball:
+            # TODO: Increment points, reset scrimmage
+            self.winner = self.teams.get(actor)
+            outcomes.append((VICTORY, self.winner))
+        # Priority 2: Ball events
+        elif target is not None and target.is_ball:
+            if actor.can_carry and not actor.carrying:
+                actor.carrying = target
+                outcomes.append((PICKUP, actor, target))
+            else:
+                # Bounce the ball away, Blood Bowl style
+                bounce_space = self.grid.random_neighbor(goal, self.random)
+                _, bounce_terrain = self.grid[bounce_space]
+                self.grid[bounce_space] = target, bounce_terrain
+                self.positions[target] = bounce_space
+                outcomes.append((BOUNCE, target, bounce_space))
+                # TODO: More deterministic bounce
+
+        self.grid[goal] = actor, terrain
+        self.positions[actor] = goal
+        if actor.carrying is not None:
+            self.positions[actor.carrying] = goal
+        return outcomes
+
+    def move(self, actor, goal: tuple) -> list:
+        """Whole move at once (no animation): leave, then arrive"""
+        self.leave(actor)
+        return self.arrive(actor, goal)
+
+    # Compact state, for searches that try moves out and come back
+    def state(self) -> tuple:
+        """(spaces, carried, turn_state, winner) with actors in add order:
+        spaces[i] where actor i is, carried[i] the index of what it carries (None when nothing)"""
+        indices = {actor: index for index, actor in enumerate(self.positions)}
+        return (tuple(self.positions.values()),
+            tuple(indices.get(actor.carrying) for actor in self.positions),
+            self.turn_state, self.winner)
+
+    def key(self) -> int:
+        """64-bit Zobrist key of the position: the grid's key (pieces, carrying, terrain)
+        with whose turn it is and any winner mixed in. Equal states get equal keys"""
+        return self.grid.zobrist ^ TURN_KEYS[self.turn_state] ^ WINNER_KEYS.get(self.winner, 0)
+
+    def restore(self, state: tuple):
+        """Put every actor back where state (from state()) had it"""
+        spaces, carried, self.turn_state, self.winner = state
+        actors = list(self.positions)
+        for actor, space in self.positions.items():
+            if self.grid[space].actor is actor:
+                self.grid[space] = None, self.grid[space].terrain
+
+        held = set()
+        for actor, space, carried_index in zip(actors, spaces, carried):
+            self.positions[actor] = space
+            actor.carrying = None if carried_index is None else actors[carried_index]
+            if actor.carrying is not None:
+                held.add(actor.carrying)
+        for actor, space in zip(actors, spaces):
+            if actor not in held: # Carried balls ride with their carrier, off the grid
+                self.grid[space] = actor, self.grid[space].terrain
+
+    def snapshot(self) -> "Simulation":
+        """Display-free copy with a Piece per actor (same order, rule attributes and carrying),
+        on an actor-free copy of the grid. Searches run on it without touching the live game"""
+        copy = Simulation(self.grid.snapshot())
+        pieces = {actor: Piece(actor.name, actor.can_carry, actor.is_ball, actor.solid,
+            actor.selectable, actor.movement_range) for actor in self.positions}
+        for actor, space in self.positions.items():
+            copy.teams[pieces[actor]] = self.teams[actor]
+            copy.positions[pieces[actor]] = space
+            copy.grid.actor_index(pieces[actor]) # Indices (and so Zobrist keys) in actor order
+        copy.restore(self.state())
+        copy.turn_number = self.turn_number
+        return copy
+
+    def end_turn(self):
+        self.turn_state = NEXT_TURN[self.turn_state]
+        self.turn_number += 1
+
+    def play_random_turn(self, move_chance: float = 0.5):
+        """Each movable piece of the side to move makes a random legal move with move_chance, then the turn ends"""
+        for actor in self.pieces(self.team_to_move):
+            if self.game_over:
+                return
+            if actor.selectable and self.random.random() < move_chance:
+                goals = self.legal_goals(actor)
+                if goals:
+                    self.move(actor, self.random.choice(goals))
+        self.end_turn()
+
+def load_simulation(level_id: int, seed: int = None) -> Simulation:
+    """Headless copy of a level: map terrain plus a Piece per level object"""
+    simulation = Simulation(seed=seed)
+    LevelLoader.load_map(level_id=level_id, into_grid=simulation.grid)
+    for team, go in LevelLoader.level_objects(level_id):
+        simulation.add(build_piece(go), team, (go["column"], go["row"]))
+    return simulation
+
+if __name__ == "__main__":
+    # Throughput check: random turns on level 1, restarting after every win
+    logging.basicConfig(level=logging.WARNING)
+    turns = 0
+    begin = time.perf_counter()
+    simulation = load_simulation(1, seed=413)
+    while time.perf_counter() - begin < 2.0:
+        if simulation.game_over:
+            simulation = load_simulation(1, seed=413 + turns)
+        simulation.play_random_turn()
+        turns += 1
+    elapsed = time.perf_counter() - begin
+    print(f"{turns} turns in {elapsed:.2f} s, {turns / elapsed:.0f} turns/sec")
@@ -81,11 +81,13 @@ TRANSITIONS = [
         "trigger": END_TURN,
         "source": [PLAYER_IDLE, PLAYER_SELECTED, PLAYER_PATHING],
         "dest": ENEMY_TURN,
+        "before": "simulation_end_turn",
         "after": "begin_policy_evaulation"
     },
     {
         "trigger": END_TURN,
         "source": ENEMY_TURN,
-        "dest": PLAYER_IDLE
+        "dest": PLAYER_IDLE,
+        "before": "simulation_end_turn"
     }
 ]
\ No newline at end of file
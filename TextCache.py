@@ -0,0 +1,54 @@
+from collections import OrderedDict
+
+import pygame
+import pygame.font
+
+# Font instances by point size (None typeface); fonts are expensive to construct
+FONT_POOL = dict()
+
+def get_font(size: int) -> pygame.font.Font:
+    """Pooled default-typeface font of the given size. pygame.font must be initialized"""
+    font = FONT_POOL.get(size)
+    if font is None:
+        font = pygame.font.Font(None, size)
+        FONT_POOL[size] = font
+    return font
+
+class TextCache:
+    """LRU cache of rendered text surfaces, keyed on (font, string, color, antialias).
+    Cached surfaces are shared between callers and must not be drawn on."""
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font: pygame.font.Font, string: str, color, antialias: bool = False) -> pygame.Surface:
+        key = (font, string, tuple(color), antialias)
+        text_surface = self.entries.get(key)
+        if text_surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return text_surface
+
+        self.misses += 1
+        text_surface = font.render(string, antialias, color)
+        self.entries[key] = text_surface
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False) # Least recently used
+        return text_surface
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+# Shared by the HUD, menu and text texture renderers
+TEXT_CACHE = TextCache()
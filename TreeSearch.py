@@ -0,0 +1,471 @@
+# TreeSearch.py
+"""Monte Carlo Tree Search for the CPU turn, stepped through the AIMachine states:
+EVALUATING_POLICY walks the tree (UCT) to a leaf and expands it, SEARCHING plays a rollout,
+VALUATION backs the result up and checks the budget, IDLE once it runs out.
+
+Searches a Simulation.snapshot() of the board: legal moves come from Simulation.legal_goals
+(range_find) and move outcomes from Simulation.arrive, the rules behind Game.evaluate_goal_arrival.
+A turn is any number of moves, each piece moving at most once, until END_TURN."""
+import os
+import math
+import time
+import random
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+from transitions import Machine
+
+import DistanceField
+from AIMachine import STATES, TRANSITIONS, IDLE, EVALUATING_POLICY, SEARCHING, VALUATION
+from Grid import NO_TERRAIN
+from Simulation import Simulation, CPU
+
+END_TURN = None # Tree action: stop moving and hand the turn over
+
+# Rollout policies: policy(search, actor, goals) -> a goal from goals, or None to leave the actor be
+def random_rollout(search: "TreeSearch", actor, goals: list):
+    """Like Simulation.play_random_turn: a random goal half the time"""
+    if goals and search.random.random() < 0.5:
+        return search.random.choice(goals)
+    return None
+
+def greedy_rollout(search: "TreeSearch", actor, goals: list, epsilon: float = 0.2):
+    """Carriers run the ball to the Endzone (or go and get it), everyone else closes in on the ball.
+    A random goal epsilon of the time"""
+    if not goals:
+        return None
+    if search.random.random() < epsilon:
+        return search.random.choice(goals)
+
+    if actor.carrying is not None:
+        return min(goals, key=lambda space: search.endzone_distance[space])
+    ball = search.ball_space()
+    if ball is None: # No ball on the board, nothing to close in on
+        return search.random.choice(goals)
+    if actor.can_carry and ball in goals:
+        return ball
+    return min(goals, key=lambda space: abs(space[0] - ball[0]) + abs(space[1] - ball[1]))
+
+ROLLOUT_POLICIES = {
+    "random": random_rollout,
+    "greedy": greedy_rollout
+}
+
+class TreeNode:
+    """Transposition table entry: one board state however it was reached.
+    value sums rollout results for the searching team"""
+    __slots__ = ("key", "team", "terminal", "visits", "value", "untried", "edges")
+
+    def __init__(self, key: tuple, team: str, terminal: bool):
+        self.key = key # (Simulation.key(), pieces moved this turn), the transposition table key
+        self.team = team # Team to move
+        self.terminal = terminal
+        self.visits = 0
+        self.value = 0.0
+        self.untried = None # Actions not yet expanded, generated on the first visit
+        self.edges = dict() # action -> TreeNode it last led to
+
+class TreeSearch:
+    """MCTS engine for one team. Stops after iterations or time_limit seconds, whichever comes first"""
+    def __init__(self, team: str = CPU, time_limit: float = 0.25, iterations: int = 5000,
+            rollout_policy="greedy", rollout_turns: int = 4, exploration: float = 1.4,
+            max_nodes: int = 200000, seed: int = None):
+        self.team = team
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.rollout_policy = ROLLOUT_POLICIES.get(rollout_policy, rollout_policy)
+        self.rollout_turns = rollout_turns
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.random = random.Random(seed)
+
+        self.machine = Machine(model=self, states=STATES, transitions=TRANSITIONS, initial=IDLE)
+
+        self.table = dict() # Transposition table: (Zobrist key, moved) -> TreeNode
+        self.simulation = None # type: Simulation
+        self.actors = list()
+        self.moved = set() # Actor indices already moved this turn
+        self.endzone_distance = None # type: np.ndarray
+
+        self.root = None # type: TreeNode
+        self.root_state = None
+        self.path = list() # Nodes visited this iteration, root first
+        self.result = 0.0 # Latest rollout value
+        self.result_visits = 1 # Rollouts summed into it
+        self.completed = 0 # Iterations this search
+        self.deadline = 0.0
+
+    # Search
+    def plan(self, simulation: Simulation) -> list:
+        """Search the side to move's turn on a snapshot of simulation.
+        Returns its most visited line of moves as [(actor, goal)] in simulation's own actors"""
+        originals = list(simulation.positions)
+        self.search(simulation.snapshot())
+        return self.principal_line(originals)
+
+    def prepare(self, simulation: Simulation):
+        """Get ready to plan on simulation outside any turn's time budget (on load, between turns).
+        A single-process search has nothing to set up"""
+        pass
+
+    def principal_line(self, originals: list) -> list:
+        """Most visited moves from the root while it is still this team's turn, as [(originals[i], goal)]"""
+        moves = list()
+        node = self.root
+        while node.team == self.team and node.edges and not node.terminal:
+            action, node = max(node.edges.items(), key=lambda edge: edge[1].visits)
+            if action is END_TURN or node.visits == 0:
+                break
+            moves.append((originals[action[0]], action[1]))
+        return moves
+
+    def attach(self, simulation: Simulation):
+        """Search on simulation from now on"""
+        self.simulation = simulation
+        self.actors = list(simulation.positions)
+        self.endzone_distance = self.endzone_field()
+
+    def search(self, simulation: Simulation, time_limit: float = None):
+        """Run iterations on simulation (modified, then put back) until the budget
+        (time_limit, default self.time_limit) runs out"""
+        self.attach(simulation)
+        self.table.clear()
+        self.moved.clear()
+        self.root_state = simulation.state()
+        self.root, _ = self.lookup()
+        self.completed = 0
+        begin = time.perf_counter()
+        self.deadline = begin + (self.time_limit if time_limit is None else time_limit)
+
+        self.board_decision()
+        while not self.is_idle():
+            self.advance()
+        simulation.restore(self.root_state)
+        logging.info(f"TreeSearch: {self.completed} iterations, {len(self.table)} nodes "
+            f"in {(time.perf_counter() - begin) * 1000:.0f} ms")
+
+    def advance(self):
+        """Do the work of the current state, then trigger the next one"""
+        if self.state == EVALUATING_POLICY:
+            self.select()
+            self.policy_choice()
+        elif self.state == SEARCHING:
+            self.result_visits = 1
+            self.result = self.rollout()
+            self.search_complete()
+        elif self.state == VALUATION:
+            self.backpropagate(self.result, self.result_visits)
+            self.completed += 1
+            if self.completed >= self.iterations or time.perf_counter() >= self.deadline:
+                self.exit_condition_reached()
+            else:
+                self.value_determined()
+
+    def select(self):
+        """Tree policy: UCT down the known tree from the root, expanding the first untried action"""
+        self.simulation.restore(self.root_state)
+        self.moved.clear()
+        node = self.root
+        self.path = [node]
+        while not node.terminal:
+            if node.untried is None:
+                node.untried = sorted(self.legal_actions(), key=self.action_priority, reverse=True)
+            if node.untried:
+                action = node.untried.pop() # Most promising first
+            elif node.edges:
+                action = self.best_action(node)
+            else:
+                break
+
+            self.apply(action)
+            child, created = self.lookup()
+            node.edges[action] = child # Bounces are random, keep the latest outcome
+            if child in self.path: # Transposition back up the line: stop the walk here
+                break
+            self.path.append(child)
+            if created:
+                break
+            node = child
+
+    def best_action(self, node: TreeNode):
+        sign = 1 if node.team == self.team else -1 # Each side picks its own best
+        log_visits = math.log(max(node.visits, 1))
+        best, best_score = None, -math.inf
+        for action, child in node.edges.items():
+            if child.visits == 0:
+                return action
+            score = sign * child.value / child.visits + self.exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = action, score
+        return best
+
+    def rollout(self) -> float:
+        """Play rollout_turns turns with the rollout policy, then value the board"""
+        simulation = self.simulation
+        for _ in range(self.rollout_turns):
+            if simulation.game_over:
+                break
+            team = simulation.team_to_move
+            for index, actor in enumerate(self.actors):
+                if simulation.game_over:
+                    break
+                if index in self.moved or not actor.selectable or simulation.teams[actor] != team:
+                    continue
+                goal = self.rollout_policy(self, actor, simulation.legal_goals(actor))
+                if goal is not None:
+                    simulation.move(actor, goal)
+            self.apply(END_TURN)
+        return self.evaluate()
+
+    def backpropagate(self, value: float, visits: int = 1):
+        for node in self.path:
+            node.visits += visits
+            node.value += value
+
+    def statistics(self, min_visits: int = 1) -> dict:
+        """Picklable tree summary for merging elsewhere:
+        {key: (team, terminal, visits, value, {action: child key})} for nodes visited min_visits times"""
+        return {node.key: (node.team, node.terminal, node.visits, node.value,
+                {action: child.key for action, child in node.edges.items()})
+            for node in self.table.values() if node.visits >= min_visits}
+
+    # Board
+    def legal_actions(self) -> list:
+        """(actor index, goal) for each unmoved piece of the side to move, then END_TURN"""
+        simulation = self.simulation
+        team = simulation.team_to_move
+        actions = list()
+        for index, actor in enumerate(self.actors):
+            if index not in self.moved and actor.selectable and simulation.teams[actor] == team:
+                actions.extend((index, goal) for goal in simulation.legal_goals(actor))
+        actions.append(END_TURN)
+        return actions
+
+    def action_priority(self, action) -> float:
+        """Expansion order, lower first: picking up the ball, then carriers closing on the Endzone
+        and everyone closing on the ball, then ending the turn. Ties are broken at random"""
+        tiebreak = self.random.random()
+        if action is END_TURN:
+            return 1000 + tiebreak
+        actor = self.actors[action[0]]
+        goal = action[1]
+        if actor.carrying is not None:
+            return self.endzone_distance[goal] + tiebreak
+        ball = self.ball_space()
+        if ball is None:
+            return tiebreak # No ball to close in on, every move ranks alike
+        steps = abs(goal[0] - ball[0]) + abs(goal[1] - ball[1])
+        if actor.can_carry and steps == 0:
+            return -1 + tiebreak
+        return steps + tiebreak
+
+    def apply(self, action):
+        if action is END_TURN:
+            self.simulation.end_turn()
+            self.moved.clear()
+        else:
+            index, goal = action
+            self.simulation.move(self.actors[index], goal)
+            self.moved.add(index)
+
+    def lookup(self) -> tuple:
+        """(node for the current board, whether it is new). Past max_nodes new nodes are not kept"""
+        key = (self.simulation.key(), frozenset(self.moved))
+        node = self.table.get(key)
+        if node is not None:
+            return node, False
+        node = TreeNode(key, self.simulation.team_to_move, self.simulation.game_over)
+        if len(self.table) < self.max_nodes:
+            self.table[key] = node
+        return node, True
+
+    def ball_space(self) -> tuple:
+        """Where the ball is (its carrier's space when carried), None on a board without one"""
+        for actor in self.actors:
+            if actor.is_ball:
+                return self.simulation.positions[actor]
+        return None
+
+    def endzone_field(self) -> np.ndarray:
+        """Movement cost from the nearest Endzone out to each space (see weighted_distance_field),
+        ignoring pieces"""
+        grid = self.simulation.grid
+        distance = DistanceField.weighted_distance_field(grid.terrain != NO_TERRAIN, grid.costs,
+            grid.terrain_mask("Endzone"))
+        return np.where(np.isinf(distance), grid.width + grid.height, distance) # Endzone-less boards stay finite
+
+    def evaluate(self) -> float:
+        """Board value for the searching team in [-1, 1]: a win is 1, a carrier counts more
+        the closer it is to the Endzone, a loose ball goes to whoever is nearer to it"""
+        simulation = self.simulation
+        if simulation.game_over:
+            return 1.0 if simulation.winner == self.team else -1.0
+
+        farthest = float(self.endzone_distance.max()) + 1
+        ball = self.ball_space()
+        nearest = dict() # team -> steps from its nearest carrier to the ball
+        for actor, space in simulation.positions.items():
+            if actor.carrying is not None:
+                sign = 1 if simulation.teams[actor] == self.team else -1
+                return sign * (0.5 + 0.4 * (1 - self.endzone_distance[space] / farthest))
+            if actor.can_carry and ball is not None: # Ball-less boards score even
+                team = simulation.teams[actor]
+                steps = abs(space[0] - ball[0]) + abs(space[1] - ball[1])
+                nearest[team] = min(nearest.get(team, steps), steps)
+
+        span = simulation.grid.width + simulation.grid.height
+        own = nearest.pop(self.team, span)
+        other = min(nearest.values(), default=span)
+        return 0.3 * (other - own) / span
+
+# ----- Parallel Search -----
+WORKER_SEARCH = None # type: TreeSearch # Per worker process, set once by the pool initializer
+DISPATCH_MARGIN = 0.02 # s of a root-parallel budget left for shipping requests and results
+
+def init_search_worker(snapshot: Simulation, settings: dict):
+    global WORKER_SEARCH
+    WORKER_SEARCH = TreeSearch(**settings)
+    WORKER_SEARCH.attach(snapshot)
+
+def worker_ready() -> bool:
+    return WORKER_SEARCH is not None
+
+def root_worker(request: tuple) -> tuple:
+    """A whole search from state. Returns (root key, iterations, statistics)"""
+    state, seed, time_limit, iterations, min_visits = request
+    search = WORKER_SEARCH
+    search.random.seed(seed)
+    search.simulation.random.seed(seed)
+    search.time_limit, search.iterations = time_limit, iterations
+    search.simulation.restore(state)
+    search.search(search.simulation)
+    return search.root.key, search.completed, search.statistics(min_visits)
+
+def rollout_worker(request: tuple) -> float:
+    """Sum of rollouts played from state, with moved pieces already moved this turn"""
+    state, moved, seed, rollouts = request
+    search = WORKER_SEARCH
+    search.random.seed(seed)
+    search.simulation.random.seed(seed)
+    total = 0.0
+    for _ in range(rollouts):
+        search.simulation.restore(state)
+        search.moved = set(moved)
+        total += search.rollout()
+    return total
+
+class ParallelTreeSearch(TreeSearch):
+    """TreeSearch over a ProcessPoolExecutor (workers default to every core but the game loop's).
+    mode "root": each worker searches the whole turn with its own seed, and the statistics
+    of their trees are summed per transposition key before picking the line.
+    mode "leaf": the tree stays in this process, each leaf gets leaf_rollouts rollouts per worker.
+    The board snapshot goes to each worker once, when the pool starts; searches only send
+    Simulation.state() tuples. The pool restarts when the pieces or terrain change.
+    prepare() starts it ahead of the turn; a start inside plan comes out of time_limit"""
+    def __init__(self, workers: int = None, mode: str = "root", min_visits: int = 1,
+            leaf_rollouts: int = 1, **settings):
+        super().__init__(**settings)
+        if mode not in ("root", "leaf"):
+            raise ValueError(f"Unknown parallel search mode: {mode}")
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.mode = mode
+        self.min_visits = min_visits
+        self.leaf_rollouts = leaf_rollouts
+        self.settings = {name: value for name, value in settings.items() if name != "seed"}
+
+        self.executor = None # type: ProcessPoolExecutor
+        self.board = None # (actor ids, terrain) the pool's snapshot was taken from
+
+    def plan(self, simulation: Simulation) -> list:
+        originals = list(simulation.positions)
+        begin = time.perf_counter()
+        self.start_pool(simulation)
+        remaining = self.time_limit - (time.perf_counter() - begin) # A pool (re)start counts against the turn
+        if self.mode == "leaf":
+            self.search(simulation.snapshot(), max(0.0, remaining))
+            return self.principal_line(originals)
+
+        state = simulation.state()
+        time_limit = max(0.0, remaining - DISPATCH_MARGIN)
+        iterations = -(-self.iterations // self.workers)
+        requests = [(state, self.random.getrandbits(32), time_limit, iterations, self.min_visits)
+            for _ in range(self.workers)]
+        self.merge(self.executor.map(root_worker, requests))
+        logging.info(f"ParallelTreeSearch: {self.completed} iterations over {self.workers} workers, "
+            f"{len(self.table)} merged nodes in {(time.perf_counter() - begin) * 1000:.0f} ms")
+        return self.principal_line(originals)
+
+    def merge(self, results):
+        """Sum worker statistics into this table, rooted at the shared root key"""
+        self.table.clear()
+        self.completed = 0
+        for root_key, completed, statistics in results:
+            self.completed += completed
+            for key, (team, terminal, visits, value, edges) in statistics.items():
+                node = self.merged_node(key)
+                node.team, node.terminal = team, terminal
+                node.visits += visits
+                node.value += value
+                for action, child_key in edges.items():
+                    if action not in node.edges:
+                        node.edges[action] = self.merged_node(child_key)
+        self.root = self.merged_node(root_key)
+
+    def merged_node(self, key: tuple) -> TreeNode:
+        node = self.table.get(key)
+        if node is None:
+            node = TreeNode(key, None, False) # Team filled in by the statistics, if any worker kept it
+            self.table[key] = node
+        return node
+
+    def rollout(self) -> float:
+        if self.mode != "leaf":
+            return super().rollout()
+        state = self.simulation.state()
+        moved = tuple(self.moved)
+        requests = [(state, moved, self.random.getrandbits(32), self.leaf_rollouts) for _ in range(self.workers)]
+        self.result_visits = self.workers * self.leaf_rollouts
+        return sum(self.executor.map(rollout_worker, requests))
+
+    def prepare(self, simulation: Simulation):
+        self.start_pool(simulation)
+
+    def start_pool(self, simulation: Simulation):
+        """(Re)start the pool when the board differs from the snapshot the workers hold.
+        Waits until the workers are up: the executor only spawns them on the first submit,
+        and their initializer would otherwise run on the first search's clock"""
+        board = (tuple(id(actor) for actor in simulation.positions), simulation.grid.terrain.tobytes())
+        if self.executor is not None and board == self.board:
+            return
+        self.close()
+        self.board = board
+        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+            initializer=init_search_worker,
+            initargs=(simulation.snapshot(), self.settings))
+        wait([self.executor.submit(worker_ready) for _ in range(self.workers)])
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+if __name__ == "__main__":
+    # Latency check: CPU turns searched on level 1, the player side playing random turns
+    from Simulation import load_simulation
+    logging.basicConfig(level=logging.WARNING)
+    simulation = load_simulation(1, seed=413)
+    engine = TreeSearch(seed=413)
+    for _ in range(10):
+        if simulation.game_over:
+            break
+        simulation.play_random_turn() # Player
+        if simulation.game_over:
+            break
+        begin = time.perf_counter()
+        moves = engine.plan(simulation)
+        print(f"turn {simulation.turn_number}: {len(moves)} moves, {(time.perf_counter() - begin) * 1000:.0f} ms")
+        for actor, goal in moves:
+            simulation.move(actor, goal)
+        simulation.end_turn()
+    print(f"winner: {simulation.winner}")
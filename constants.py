@@ -1,16 +1,15 @@
 import os
-import pygame
 
 # Setting root path based on THIS FILE being at root level
 ROOT_PATH = os.path.dirname(os.path.realpath(__file__))
 
+# Fixed game.update rate, independent of the render rate
+SIMULATION_HZ = 30
+
 # Mouse Click integers
 BUTTON_LEFT_CLICK = 1
 BUTTON_RIGHT_CLICK = 3
 
-# Utilizing pygame custom events
-VICTORY_EVENT = pygame.USEREVENT+1
-
 # Cardinal Directions
 NORTH = 0
 SOUTH = 1
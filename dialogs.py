@@ -0,0 +1,12 @@
+import logging
+import ctypes
+
+# No windows or message boxes (dummy SDL video driver, servers without a display)
+HEADLESS = False
+
+def message_box(message: str, title: str):
+    """Blocking Windows message box; logged instead when headless or off Windows"""
+    if HEADLESS or not hasattr(ctypes, "windll"):
+        logging.info("{0}: {1}".format(title, message))
+        return
+    ctypes.windll.user32.MessageBoxW(0, message, title, 0)
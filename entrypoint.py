@@ -1,10 +1,14 @@
+import os
 import logging
+import argparse
 
 import pygame
 import pygame.display
 
 import Game
 import Driver
+import dialogs
+import TreeSearch
 
 # Full windows size params
 WIDTH = 800 # px
@@ -17,18 +21,39 @@ HUD_HEIGHT = 80 # px
 GAME_WIDTH = WIDTH - MENU_WIDTH # 800 - 160 = 640
 GAME_HEIGHT = HEIGHT - HUD_HEIGHT # 600 - 160 = 440
 
-# Game Board size params (B = G x C)
+# Board viewport size params (B = G x C), maps larger than this scroll (arrow keys) and zoom (wheel)
 # Ex: 20 * 16 = 320x320 board pixel size
 # Ex: 20 * 20 = 400x400
 COLUMNS = 15
 ROWS = 15
-CELL_SIZE = 30 # px, length & width
+CELL_SIZE = 30 # px, length & width at zoom 1
+
+# Redraw only changed regions (pygame.display.update) instead of flipping every frame
+DIRTY_RECTS = True
 
 BOARD_HEIGHT = (ROWS * CELL_SIZE) + 1 # px, plus one for hangover border
 BOARD_WIDTH = (COLUMNS * CELL_SIZE) + 1 # px
 
 if __name__ == '__main__':
-    debug = False # TODO: Build-based parameters (os.getenv)?
+    parser = argparse.ArgumentParser(description="Corinthian Football")
+    parser.add_argument("--headless", action="store_true",
+        help="no window: run a scripted session uncapped and report render timings")
+    parser.add_argument("--frames", type=int, default=300, help="headless session length")
+    parser.add_argument("--dump-frames", metavar="DIR", help="headless: save every frame as a PNG in DIR")
+    parser.add_argument("--full-redraw", action="store_true", help="disable dirty-rect rendering")
+    parser.add_argument("--debug", action="store_true", help="debug logging, FPS caption and frame time graph")
+    parser.add_argument("--profile", metavar="FILE", help="write a Chrome trace (JSON) of the frame phases on exit")
+    parser.add_argument("--ai-workers", type=int, metavar="N",
+        help="search the CPU turn over N worker processes (0: every core but the game loop's)")
+    parser.add_argument("--ai-mode", choices=["root", "leaf"], default="root",
+        help="parallel search: whole searches per worker, merged (root) or rollouts per worker (leaf)")
+    args = parser.parse_args()
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy" # Must be set before the display initializes
+        dialogs.HEADLESS = True
+
+    debug = args.debug
     if debug:
         logging.basicConfig(level=logging.DEBUG)
     else:
@@ -64,6 +89,10 @@ if __name__ == '__main__':
         hud=hud_bounds,
         menu=menu_bounds)
 
+    if args.ai_workers is not None:
+        game.enemy_ai = TreeSearch.ParallelTreeSearch(workers=args.ai_workers or None, mode=args.ai_mode,
+            time_limit=Game.AI_TIME_LIMIT)
+
     # Initial game load from Driver
     # level_loader = LevelLoader(debug=debug)
     Driver.game_load(1, game)
@@ -73,4 +102,15 @@ if __name__ == '__main__':
     Driver.register_surfaces(display=screen,
         game=game_surface, board=game_board, hud=hud, menu=menu)
     
-    Driver.game_loop(game=game, debug=debug)
+    dirty_rects = DIRTY_RECTS and not args.full_redraw
+    if args.headless:
+        profiler = Driver.headless_loop(game,
+            frames=args.frames,
+            script=Driver.demo_script(game, args.frames),
+            dirty_rects=dirty_rects,
+            dump_path=args.dump_frames)
+        print(profiler.report())
+        if args.profile is not None:
+            profiler.chrome_trace(args.profile)
+    else:
+        Driver.game_loop(game=game, debug=debug, dirty_rects=dirty_rects, profile_path=args.profile)
@@ -3,6 +3,7 @@ import logging
 from abc import ABC, abstractmethod
 from pygame import Rect
 from renderers import ObjectRenderer
+from constants import SIMULATION_HZ
 
 class BaseObject(ABC, Rect):
     def __init__(self, x, y, w, h, **kwargs):
@@ -24,10 +25,15 @@ class BaseObject(ABC, Rect):
 
         self.can_carry = False
         self.carrying = None
+        self.is_ball = False # Rules (Simulation) go by attributes, not classes
 
     def __hash__(self):
         return id(self)
 
+    def interpolated_rect(self, alpha: float) -> Rect:
+        """Where to draw the object alpha (0-1) of the way through the current tick"""
+        return Rect(self)
+
     @abstractmethod
     def update(self):
         """Called each frame for Game Object to update itself"""
@@ -39,8 +45,11 @@ class Moveable(BaseObject):
         super().__init__(**kwargs)
         self.moving_x = 0
         self.moving_y = 0
+        # Position before the latest update, for interpolated drawing
+        self.previous_x = self.x
+        self.previous_y = self.y
 
-        self.speed = 10
+        self.speed = 300 # Pixels per second
         self.movement_range = 5
 
     def move(self, dx: int, dy: int):
@@ -64,16 +73,17 @@ class Moveable(BaseObject):
 
     def partial_move(self, x: int, y: int):
         """Targeted partial pixel move. Attempts to move towards target.
-        Limted by object speed (max pixels/move).
+        Limted by object speed (pixels/second, so speed / SIMULATION_HZ per update).
         Should only be called once per frame/update,
         and not in same update/frame if 'move_to' was called"""
         # Distance from target
         dist_x = abs(x - self.x)
         dist_y = abs(y - self.y)
-        
-        # Only step speed length if target is further away
-        min_x = min(dist_x, self.speed)
-        min_y = min(dist_y, self.speed)
+        step = max(1, round(self.speed / SIMULATION_HZ))
+
+        # Only step a full step if target is further away
+        min_x = min(dist_x, step)
+        min_y = min(dist_y, step)
         if x < self.x: min_x = -min_x
         if y < self.y: min_y = -min_y
 
@@ -82,7 +92,19 @@ class Moveable(BaseObject):
 
         self.move(min_x, min_y)
 
+    def interpolated_rect(self, alpha: float) -> Rect:
+        return Rect(round(self.previous_x + (self.x - self.previous_x) * alpha),
+            round(self.previous_y + (self.y - self.previous_y) * alpha),
+            self.w, self.h)
+
+    @property
+    def interpolating(self) -> bool:
+        """Moved in the latest update"""
+        return self.x != self.previous_x or self.y != self.previous_y
+
     def update(self):
+        self.previous_x = self.x
+        self.previous_y = self.y
         if self.moving_x or self.moving_y: # If we're moving (at least one axis)
             self.x += self.moving_x
             self.y += self.moving_y
@@ -117,6 +139,7 @@ class Ball(Moveable, Renderable):
 
         self.selectable = False
         self.solid = False
+        self.is_ball = True
 
 class Blocker(Moveable, Renderable):
     def __init__(self, **kwargs):
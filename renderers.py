@@ -1,19 +1,43 @@
 import logging
+from bisect import insort
 
 import pygame
 import pygame.draw
 import pygame.display
 
 from abc import ABC, abstractmethod
+from TextCache import TEXT_CACHE, get_font
 # from objects import Renderable
 
+# Pre-rasterized actor looks, keyed by (shape, color, cell_size, carrying)
+SPRITE_CACHE = dict()
+
+def clear_sprite_cache():
+    """Drop every cached sprite (cell size or palette changed)"""
+    SPRITE_CACHE.clear()
+
 class ObjectRenderer(ABC):
     def __init__(self, color):
-        self.color = color
+        self._color = color
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, color):
+        # Palette change: cached sprites in the old color are stale
+        self._color = color
+        clear_sprite_cache()
 
-    @abstractmethod
     def draw_game_object(self, surface: pygame.Surface, rect: pygame.Rect):
-        """Called each time Driver calls to Renderer to draw the game object"""
+        """Draws the game object on its own (RenderList batches many into one blits call)"""
+        surface.blits(self.blit_sequence(rect), doreturn=False)
+
+    @abstractmethod
+    def blit_sequence(self, go, rect: pygame.Rect = None) -> list:
+        """(source surface, destination) pairs that draw the game object at rect
+        (its on-screen rect, default the object's own)"""
         pass # Abstract
 
 class ShapeRenderer(ObjectRenderer):
@@ -21,12 +45,27 @@ class ShapeRenderer(ObjectRenderer):
         super().__init__(color)
         self.shape = shape
 
-    def draw_game_object(self, surface: pygame.Surface, rect: pygame.Rect):
+    def blit_sequence(self, go, rect: pygame.Rect = None) -> list:
+        """The actor's cached sprite, rasterized on first use"""
+        rect = rect or go
+        return [(self.sprite(go, rect), rect.topleft)]
+
+    def sprite(self, go, rect: pygame.Rect) -> pygame.Surface:
+        carrying = getattr(go, "carrying", None) is not None
+        key = (self.shape, self.color, rect.w, carrying)
+        sprite = SPRITE_CACHE.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((rect.w, rect.h), pygame.SRCALPHA)
+            self.draw_shape(sprite, pygame.Rect(0, 0, rect.w, rect.h), carrying)
+            if pygame.display.get_surface() is not None: # convert needs a display mode
+                sprite = sprite.convert_alpha()
+            SPRITE_CACHE[key] = sprite
+        return sprite
+
+    def draw_shape(self, surface: pygame.Surface, rect: pygame.Rect, carrying: bool):
         """Draws actor/game object based on shape definition.
         Draws actor w/ body and hand, facing a direction.
-        Hand is defined as mini-version of body"""
-        # TODO: Make Renderer a classed object, to precalculate render values
-        # TODO: Setup pre-drawn surface for the object and simply blit over?
+        Hand is defined as mini-version of body, shown while carrying"""
         body_center = (rect.x + (rect.w / 3), rect.centery)
         if self.shape == "circle":
             body_radius = (rect.w / 3)
@@ -48,4 +87,98 @@ class ShapeRenderer(ObjectRenderer):
                 self.color,
                 pygame.Rect(rect.x, rect.y, rect.w, rect.h),
                 0 # Fill the square
-                )
\ No newline at end of file
+                )
+
+        if carrying:
+            hand_center = (rect.x + (rect.w * 5 / 6), rect.centery)
+            pygame.draw.circle(surface,
+                self.color,
+                hand_center,
+                rect.w / 9, # radius, a third of the body's
+                0)
+
+class TextRenderer(ObjectRenderer):
+    """Draws the object's text_texture, one centered line per texture row"""
+    def blit_sequence(self, go, rect: pygame.Rect = None) -> list:
+        rect = rect or go
+        texture = getattr(go, "text_texture", "")
+        # Split texture into array of string
+        texture_lines = [row for row in (raw.strip() for raw in texture.splitlines()) if row]
+        if not texture_lines:
+            return list()
+        # Count number of rows for texture height
+        texture_height = rect.h // len(texture_lines)
+        texture_font = get_font(texture_height) # Pooled, never built per frame
+
+        sequence = list()
+        top = rect.centery - (texture_height * len(texture_lines)) // 2
+        for i_row, t_row in enumerate(texture_lines):
+            text_surface = TEXT_CACHE.render(texture_font, t_row, self.color)
+            text_rect = text_surface.get_rect(center=(rect.centerx, top + (texture_height * i_row) + (texture_height // 2)))
+            sequence.append((text_surface, text_rect))
+        return sequence
+
+# Draw order, bottom to top
+LAYER_DECALS = 0 # Non-solid board markings
+LAYER_BALL = 1 # Loose ball
+LAYER_UNITS = 2
+LAYER_CARRIED = 3 # Ball in a carrier's hand, over its carrier
+
+# Object color by side
+TEAM_COLORS = {
+    "player": (0, 200, 0),
+    "cpu": (200, 0, 0),
+    "neutral": (255, 255, 255)
+}
+
+def build_renderer(go, team: str) -> ObjectRenderer:
+    color = TEAM_COLORS.get(team, TEAM_COLORS["neutral"])
+    if go.render_mode == "text_texture":
+        return TextRenderer(color)
+    return ShapeRenderer(color, go.shape)
+
+class RenderList:
+    """Renderable game objects kept sorted by (layer, insertion order), updated on
+    spawn/despawn/layer change so drawing a frame is a single Surface.blits call"""
+    def __init__(self):
+        self.entries = list() # (layer, sequence, object), sorted
+        self.layers = dict() # object -> (layer, sequence)
+        self.sequence = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, go):
+        return go in self.layers
+
+    def __iter__(self):
+        return (go for _, _, go in self.entries)
+
+    def add(self, go, layer: int):
+        if go in self.layers:
+            self.remove(go)
+        self.sequence += 1
+        self.layers[go] = (layer, self.sequence)
+        insort(self.entries, (layer, self.sequence, go)) # sequence is unique, objects never compared
+
+    def remove(self, go):
+        layer, sequence = self.layers.pop(go)
+        self.entries.remove((layer, sequence, go))
+
+    def set_layer(self, go, layer: int):
+        if self.layers[go][0] != layer:
+            self.add(go, layer)
+
+    def draw(self, surface: pygame.Surface, camera=None, alpha: float = 1.0):
+        """Draw every object alpha of the way from its previous to its current position,
+        or with a camera only those on screen (inside the surface clip)"""
+        if camera is None:
+            blits = [blit for _, _, go in self.entries for blit in go.renderer.blit_sequence(go, go.interpolated_rect(alpha))]
+        else:
+            area = surface.get_clip()
+            blits = list()
+            for _, _, go in self.entries:
+                rect = camera.world_rect_to_view(go.interpolated_rect(alpha))
+                if rect.colliderect(area):
+                    blits.extend(go.renderer.blit_sequence(go, rect))
+        surface.blits(blits, doreturn=False)